@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Indexed fuzzy matching of free-text locations to Dubai Pulse area names.
+
+Built once per vocabulary. Lookups try an exact match on the normalized name
+first. Otherwise a trigram inverted index picks a short candidate list, and
+difflib's ratio is computed only on those candidates. Every resolved input is
+memoized, so repeated portfolio rows cost a dict lookup.
+"""
+import re
+import difflib
+from collections import defaultdict
+import numpy as np
+
+CUTOFF = 0.5        # same threshold the dashboard used with get_close_matches
+MAX_CANDIDATES = 25
+
+_punct = re.compile(r"[^a-z0-9 ]+")
+_space = re.compile(r"\s+")
+
+def normalize(name):
+    return _space.sub(" ", _punct.sub(" ", str(name).lower())).strip()
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class AreaMatcher:
+    def __init__(self, areas, aliases=None, cutoff=CUTOFF):
+        """`areas` are canonical names; `aliases` maps extra names (e.g. projects) to an area."""
+        self.cutoff = cutoff
+        self.targets = {}   # normalized vocabulary entry → canonical area
+        areas = list(areas)
+        known = set(areas)
+        for area in areas:
+            if isinstance(area, str) and area.strip():
+                self.targets.setdefault(normalize(area), area)
+        for alias, area in (aliases or {}).items():
+            if isinstance(alias, str) and alias.strip() and area in known:
+                self.targets.setdefault(normalize(alias), area)
+        self.keys = list(self.targets)
+        postings = defaultdict(list)
+        for k, key in enumerate(self.keys):
+            for g in trigrams(key):
+                postings[g].append(k)
+        self.index = {g: np.asarray(ks, dtype=np.int32) for g, ks in postings.items()}
+        self.memo = {}
+
+    def _candidates(self, norm):
+        """Vocabulary keys sharing the most trigrams with `norm` (best first)."""
+        lists = [self.index[g] for g in trigrams(norm) if g in self.index]
+        if not lists:
+            return []
+        hits = np.bincount(np.concatenate(lists), minlength=len(self.keys))
+        top = np.flatnonzero(hits)
+        if len(top) > MAX_CANDIDATES:
+            top = top[np.argpartition(-hits[top], MAX_CANDIDATES)[:MAX_CANDIDATES]]
+        return [self.keys[k] for k in top[np.argsort(-hits[top], kind="stable")]]
+
+    def _best(self, norm, keys):
+        best, best_ratio = None, self.cutoff
+        sm = difflib.SequenceMatcher()
+        sm.set_seq2(norm)
+        for key in keys:
+            sm.set_seq1(key)
+            if sm.real_quick_ratio() >= best_ratio and sm.quick_ratio() >= best_ratio:
+                r = sm.ratio()
+                if r >= best_ratio and (best is None or r > best_ratio):
+                    best, best_ratio = key, r
+        return best
+
+    def match(self, name):
+        """Canonical area for `name`, or None when nothing clears the cutoff."""
+        if not isinstance(name, str):
+            return None
+        if name in self.memo:
+            return self.memo[name]
+        norm = normalize(name)
+        key = norm if norm in self.targets else None
+        if key is None and norm:
+            key = self._best(norm, self._candidates(norm))
+            if key is None:
+                # rare: similar by ratio but sharing few trigrams — fall back to a full scan once
+                key = self._best(norm, self.keys)
+        self.memo[name] = self.targets.get(key) if key else None
+        return self.memo[name]
+
+    def match_many(self, names):
+        """Vector form for a pandas Series: each distinct value is resolved once."""
+        return names.map({n: self.match(n) for n in names.dropna().unique()})
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""Offline stand-ins for FRED, Yahoo, Cbonds, Dubai Pulse, SMTP and Graph used by the benchmarks.
+
+Everything is generated deterministically from a seed, so two commits
+benchmarked on the same machine see identical inputs.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import types
+import zlib
+import threading
+import socketserver
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED = 7
+
+# first observation per FRED series, as in the real processed files
+FRED_START = {"DGS1MO": "2001-07-31", "NASDAQCOM": "1971-02-05", "SP500": "2015-10-21", "DJIA": "2015-10-21"}
+YAHOO_START = "1985-01-02"
+
+def random_walk(series_id, start, end=None, level=4.0, vol=0.05):
+    """Business-daily random walk with ~3% NaN holidays, stable per series id."""
+    rng = np.random.default_rng(zlib.crc32(f"{SEED}:{series_id}".encode()))
+    idx = pd.bdate_range(start, end or pd.Timestamp.today().normalize())
+    values = level + np.cumsum(rng.normal(0, vol, len(idx)))
+    values[rng.random(len(idx)) < 0.03] = np.nan
+    return pd.Series(values, index=idx)
+
+class FakeFred:
+    """Drop-in for fredapi.Fred.get_series with a fixed per-call latency."""
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_series(self, series_id, observation_start=None, **_):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        level = 1000.0 if series_id in ("SP500", "NASDAQCOM", "DJIA") else 4.0
+        s = random_walk(series_id, FRED_START.get(series_id, "2001-07-31"), level=level,
+                        vol=level * 0.01)
+        return s[s.index >= pd.Timestamp(observation_start)] if observation_start else s
+
+def install_fake_yfinance(latency=0.05):
+    """Register a fake `yfinance` module whose download() returns a (Price, Ticker) frame."""
+    mod = types.ModuleType("yfinance")
+    mod.calls = 0
+
+    def download(tickers, start=None, period=None, **_):
+        mod.calls += 1
+        time.sleep(latency)
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        cols = {}
+        for t in tickers:
+            s = random_walk(t, YAHOO_START, level=5000.0, vol=40.0).ffill()
+            if start is not None:
+                s = s[s.index >= pd.Timestamp(start)]
+            cols[("Close", t)] = s
+        df = pd.DataFrame(cols)
+        df.columns = pd.MultiIndex.from_tuples(df.columns, names=["Price", "Ticker"])
+        df.index.name = "Date"
+        return df
+
+    mod.download = download
+    sys.modules["yfinance"] = mod
+    return mod
+
+# ---------- Cbonds ----------
+def cbonds_templates():
+    """One real item per endpoint from the checked-in demo dumps."""
+    path = sorted(glob.glob(os.path.join(REPO_DIR, "data", "processed", "cbonds", "*.json")))[0]
+    with open(path, encoding="utf-8") as f:
+        dump = json.load(f)
+    return {ep: js["items"][0] for ep, js in dump.items() if js.get("items")}
+
+def cbonds_dataset(isins, per_isin=None):
+    """{endpoint: [items]} cloned from the templates with distinct ids, ISINs and dates."""
+    per_isin = per_isin or {"emissions": 1, "flows": 30, "offers": 2, "tradings": 500}
+    templates = cbonds_templates()
+    rng = np.random.default_rng(SEED)
+    out = {}
+    for ep, template in templates.items():
+        items, n = [], per_isin.get(ep, 1)
+        for k, isin in enumerate(isins):
+            issue = pd.Timestamp("2020-01-15") + pd.Timedelta(days=int(rng.integers(0, 1500)))
+            maturity = issue + pd.DateOffset(years=int(rng.integers(3, 11)))
+            coupon = round(float(rng.uniform(0.02, 0.08)), 4)
+            for j in range(n):
+                item = dict(template, id=str(k * 100000 + j))
+                for field in ("isin_code", "emission_isin_code"):
+                    if field in item:
+                        item[field] = isin
+                item["maturity_date"] = item["emission_maturity_date"] = f"{maturity:%Y-%m-%d}"
+                item["updating_date"] = "2025-01-01"
+                item["updated_at"] = "2025-01-01T00:00:00"
+                if ep == "flows":
+                    item["date"] = f"{issue + pd.DateOffset(months=6 * (j + 1)):%Y-%m-%d}"
+                    item["start_date"] = f"{issue + pd.DateOffset(months=6 * j):%Y-%m-%d}"
+                    item["cupon_rate"] = str(coupon)
+                    item["cupon_sum"] = str(coupon / 2 * 1000)
+                    item["emission_nominal_price"] = "1000"
+                    item["redemtion"] = "1000" if j == n - 1 else None
+                if ep == "tradings":
+                    item["date"] = f"{pd.Timestamp('2023-01-02') + pd.offsets.BDay(j):%Y-%m-%d}"
+                    item["mid_price"] = str(round(100 + float(rng.normal(0, 3)), 4))
+                if ep == "emissions":
+                    item["curr_coupon_rate"] = str(coupon * 100)
+                    item["emitent_name_eng"] = f"Issuer {k}"
+                items.append(item)
+        out[ep] = items
+    return out
+
+class FakeCbonds:
+    """Local HTTP stand-in for ws.cbonds.info honouring eq/in/ge filters and limit/offset."""
+    METHODS = {"get_emissions": "emissions", "get_flow_new": "flows", "get_offert": "offers",
+               "get_tradings_new": "tradings"}
+
+    def __init__(self, data, latency=0.05):
+        self.data, self.latency, self.requests = data, latency, 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                fake.requests += 1
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                items = fake.data.get(fake.METHODS.get(self.path.rstrip("/").split("/")[-1]), [])
+                for f in body.get("filters", []):
+                    if f["operator"] == "in":
+                        allowed = set(f["value"].split(";"))
+                        items = [i for i in items if i.get(f["field"]) in allowed]
+                    elif f["operator"] == "eq":
+                        items = [i for i in items if i.get(f["field"]) == f["value"]]
+                    elif f["operator"] == "ge":
+                        items = [i for i in items if str(i.get(f["field"]) or "") >= f["value"]]
+                q = body.get("quantity", {"limit": 20, "offset": 0})
+                page = items[q["offset"]:q["offset"] + q["limit"]]
+                time.sleep(fake.latency)
+                payload = json.dumps({"count": len(page), "total": len(items), "items": page}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def close(self):
+        self.server.shutdown()
+
+def isin_list(n):
+    return [f"XS{9000000000 + i:010d}" for i in range(n)]
+
+# ---------- Dubai Pulse ----------
+def area_names(n=220):
+    rng = np.random.default_rng(SEED)
+    words = ["Marina", "Bay", "Palm", "Jumeirah", "Downtown", "Hills", "Creek", "Harbour", "Village",
+             "Circle", "Al Barsha", "Warsan", "Business", "Gardens", "Heights", "Park", "Sports",
+             "Silicon", "Oasis", "Arjan", "Furjan", "Meydan", "Nad Al Sheba", "Al Quoz", "Deira"]
+    names = set()
+    while len(names) < n:
+        names.add(" ".join(rng.choice(words, size=int(rng.integers(1, 4)), replace=False)))
+    return sorted(names)
+
+def pulse_parquet(path, rows, row_group_size=250_000):
+    """Write a synthetic Pulse transactions file with the real column names, in row-group chunks."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(SEED)
+    areas = np.array(area_names())
+    projects = np.array([f"{a} Tower {i}" for a in areas for i in range(5)])
+    writer = None
+    tmp = f"{path}.tmp"
+    for start in range(0, rows, row_group_size):
+        n = min(row_group_size, rows - start)
+        a = rng.integers(0, len(areas), n)
+        df = pd.DataFrame({
+            "transaction_id": np.arange(start, start + n).astype(str),
+            "instance_date": pd.Timestamp("2012-01-01") + pd.to_timedelta(rng.integers(0, 5000, n), unit="D"),
+            "area_name_en": areas[a],
+            "project_name_en": projects[a * 5 + rng.integers(0, 5, n)],
+            "procedure_area": rng.uniform(35, 400, n),
+            "actual_worth": rng.lognormal(14, 0.6, n),
+            "meter_sale_price": rng.lognormal(9.5 + (a % 7) * 0.05, 0.35, n),
+        })
+        df.loc[rng.random(n) < 0.001, "area_name_en"] = None
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        writer = writer or pq.ParquetWriter(tmp, table.schema)
+        writer.write_table(table)
+    writer.close()
+    os.replace(tmp, path)
+    return path
+
+def portfolio_locations(n):
+    """Free-text locations: project names, area names and misspellings."""
+    rng = np.random.default_rng(SEED)
+    areas = area_names()
+    out = []
+    for i in range(n):
+        a = areas[int(rng.integers(0, len(areas)))]
+        kind = i % 3
+        out.append(a.upper() if kind == 0 else f"{a} Tower {int(rng.integers(0, 5))}" if kind == 1
+                   else a.lower().replace("a", "e", 1))
+    return out
+
+# ---------- mail ----------
+class FakeSmtp:
+    """Local plain-TCP SMTP stand-in (EHLO, AUTH PLAIN, MAIL/RCPT/DATA) with a fixed latency per reply."""
+    def __init__(self, latency=0.005):
+        self.latency, self.connections, self.logins, self.messages = latency, 0, 0, []
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, *lines):
+                time.sleep(fake.latency)
+                self.wfile.write("".join(f"{code}{'-' if i < len(lines) - 1 else ' '}{text}\r\n"
+                                         for i, (code, text) in enumerate(lines)).encode())
+
+            def handle(self):
+                with fake._lock:
+                    fake.connections += 1
+                self.reply((220, "fake ESMTP"))
+                sender, rcpts = None, []
+                for line in self.rfile:
+                    verb, _, arg = line.decode("utf-8", "replace").strip().partition(" ")
+                    verb = verb.upper()
+                    if verb in ("EHLO", "HELO"):
+                        self.reply((250, "localhost"), (250, "AUTH PLAIN"), (250, "8BITMIME"))
+                    elif verb == "AUTH":
+                        with fake._lock:
+                            fake.logins += 1
+                        self.reply((235, "2.7.0 Accepted"))
+                    elif verb == "MAIL":
+                        sender, rcpts = arg, []
+                        self.reply((250, "OK"))
+                    elif verb == "RCPT":
+                        rcpts.append(arg)
+                        self.reply((250, "OK"))
+                    elif verb == "DATA":
+                        self.reply((354, "End data with <CR><LF>.<CR><LF>"))
+                        data = b"".join(iter(lambda: self.rfile.readline(), b".\r\n"))
+                        with fake._lock:
+                            fake.messages.append((sender, rcpts, data))
+                        self.reply((250, "OK queued"))
+                    elif verb in ("RSET", "NOOP"):
+                        self.reply((250, "OK"))
+                    elif verb == "QUIT":
+                        self.reply((221, "Bye"))
+                        return
+                    else:
+                        self.reply((502, "Not implemented"))
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.host, self.port = "127.0.0.1", self.server.server_address[1]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class FakeGraph:
+    """Local HTTP stand-in for Graph's Drafts listing (paged), $batch, /send, /sendMail and draft creation.
+
+    Every `throttle_every`-th sub-request is answered 429 once, to exercise the retry path.
+    Like Graph, a $batch runs its sub-requests in dependsOn order and at most
+    `mailbox_concurrency` at a time; the rest are answered 429 (counted in
+    `over_limit`), and dependents of a failed sub-request get 424.
+    """
+    def __init__(self, n_drafts=0, latency=0.05, throttle_every=0, mailbox_concurrency=4):
+        self.drafts = {f"draft-{i}": {"id": f"draft-{i}", "subject": f"Report {i}",
+                                      "toRecipients": [{"emailAddress": {"address": f"user{i}@example.com"}}]}
+                       for i in range(n_drafts)}
+        self.latency, self.throttle_every, self.mailbox_concurrency = latency, throttle_every, mailbox_concurrency
+        self.requests, self.sub_requests, self.over_limit, self.sent = 0, 0, 0, []
+        self._lock = threading.Lock()
+        fake = self
+
+        def handle(method, path, body):
+            """(status, body) for one Graph call; `path` is relative to /v1.0."""
+            with fake._lock:
+                fake.sub_requests += 1
+                if fake.throttle_every and fake.sub_requests % fake.throttle_every == 0:
+                    return 429, {"error": {"code": "TooManyRequests", "message": "throttled"}}
+                parts = path.strip("/").split("/")
+                if method == "POST" and parts[:2] == ["me", "messages"] and parts[-1] == "send":
+                    if fake.drafts.pop(parts[2], None) is None:
+                        return 404, {"error": {"code": "ErrorItemNotFound", "message": "no such draft"}}
+                    fake.sent.append(parts[2])
+                    return 202, None
+                if method == "POST" and parts == ["me", "sendMail"]:
+                    fake.sent.append(body["message"])
+                    return 202, None
+                if method == "POST" and parts == ["me", "messages"]:
+                    draft_id = f"draft-{len(fake.drafts) + len(fake.sent)}"
+                    fake.drafts[draft_id] = {"id": draft_id, **body}
+                    return 201, fake.drafts[draft_id]
+            return 404, {"error": {"code": "NotFound", "message": path}}
+
+        def run_batch(requests):
+            """Responses for a $batch: requests with no pending dependency run together, in waves."""
+            by_id = {r["id"]: r for r in requests}
+            depth = {}
+            def level(rid):
+                if rid not in depth:
+                    depth[rid] = 1 + max((level(d) for d in by_id[rid].get("dependsOn") or []), default=-1)
+                return depth[rid]
+            status_of, running, out = {}, {}, []
+            for req in sorted(requests, key=lambda r: level(r["id"])):
+                wave = depth[req["id"]]
+                if any(not 200 <= status_of[d] < 300 for d in req.get("dependsOn") or []):
+                    status, payload = 424, {"error": {"code": "FailedDependency", "message": "dependency failed"}}
+                elif running.get(wave, 0) >= fake.mailbox_concurrency:
+                    with fake._lock:
+                        fake.over_limit += 1
+                    status, payload = 429, {"error": {"code": "ApplicationThrottled",
+                                                      "message": "over the MailboxConcurrency limit"}}
+                else:
+                    running[wave] = running.get(wave, 0) + 1
+                    status, payload = handle(req["method"], req["url"], req.get("body"))
+                status_of[req["id"]] = status
+                resp = {"id": req["id"], "status": status, "body": payload}
+                if status == 429:
+                    resp["headers"] = {"Retry-After": "0"}
+                out.append(resp)
+            return out
+
+        class Handler(BaseHTTPRequestHandler):
+            def respond(self, status, payload):
+                time.sleep(fake.latency)
+                data = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                fake.requests += 1
+                url = urllib.parse.urlsplit(self.path)
+                if urllib.parse.unquote(url.path) != "/v1.0/me/mailFolders('Drafts')/messages":
+                    return self.respond(404, {"error": {"code": "NotFound", "message": url.path}})
+                q = dict(urllib.parse.parse_qsl(url.query))
+                top, skip = int(q.get("$top", 10)), int(q.get("$skip", 0))
+                with fake._lock:
+                    items = list(fake.drafts.values())
+                page = {"value": items[skip:skip + top]}
+                if skip + top < len(items):
+                    page["@odata.nextLink"] = (f"http://127.0.0.1:{fake.server.server_port}/v1.0/me/"
+                                               f"mailFolders('Drafts')/messages?$top={top}&$skip={skip + top}")
+                self.respond(200, page)
+
+            def do_POST(self):
+                fake.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                path = urllib.parse.urlsplit(self.path).path
+                if path == "/v1.0/$batch":
+                    return self.respond(200, {"responses": run_batch(body["requests"])})
+                status, payload = handle("POST", path[len("/v1.0"):], body)
+                self.respond(status, payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1.0"
+
+    def close(self):
+        self.server.shutdown()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Offline benchmark suite.
+
+Runs the updater, each dashboard section's data preparation, the shared
+series cache, Pulse aggregation, fuzzy matching and outbound mail against the
+local stand-ins in fixtures.py.
+Nothing touches the network. Results are written as JSON so that two commits
+can be compared:
+
+    python benchmarks/run_benchmarks.py                       # → benchmarks/results/<sha>.json
+    python benchmarks/run_benchmarks.py --pulse-rows 100000 1000000 10000000
+    python benchmarks/run_benchmarks.py --compare old.json new.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import fixtures  # noqa: E402
+
+RESULTS = {}
+
+def bench(name, fn, repeat=3, setup=None, **meta):
+    """Time fn() `repeat` times (after optional setup() each round) and record min/median seconds."""
+    times, value = [], None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - t)
+    RESULTS[name] = {"min_s": min(times), "median_s": statistics.median(times), "repeat": repeat, **meta}
+    print(f"{name:<44}{min(times) * 1000:>11.1f} ms  (median {statistics.median(times) * 1000:.1f})")
+    return value
+
+def _peak_mb(fn):
+    """Peak Python/NumPy heap (tracemalloc) while running fn(), in MB."""
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+    finally:
+        tracemalloc.stop()
+
+def git_sha():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=fixtures.REPO_DIR,
+                                       text=True).strip()
+    except Exception:
+        return "unknown"
+
+# ---------- updater ----------
+def bench_updater(work, latency):
+    os.environ.setdefault("FRED_API_KEY", "0" * 32)
+    fixtures.install_fake_yfinance(latency)
+    import market_data_updater as upd
+    upd.fred = fixtures.FakeFred(latency)
+    data_dir = os.path.join(work, "updater")
+    upd.DATA_DIR, upd.STORE_DIR = data_dir, os.path.join(data_dir, "store")
+
+    def reset():
+        shutil.rmtree(data_dir, ignore_errors=True)
+        os.makedirs(data_dir)
+
+    bench("updater.full_refresh", lambda: _quiet(lambda: upd.update_all(full=True, yahoo=True)), repeat=2,
+          setup=reset, fred_latency_s=latency)
+    bench("updater.incremental_refresh", lambda: _quiet(lambda: upd.update_all(yahoo=True)), repeat=3,
+          fred_latency_s=latency)
+    return upd.STORE_DIR
+
+def _quiet(fn):
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            return fn()
+        finally:
+            sys.stdout = stdout
+
+# ---------- dashboard sections ----------
+def bench_ust(store_dir):
+    import data_access
+    import yield_curve
+    import downsample
+    fred = fixtures.FakeFred(latency=0)
+
+    def prepare():
+        start = datetime.now() - timedelta(days=5 * 365)
+        frames = {sid: data_access.load_series(store_dir, sid, start, data_access.fred_fetcher(fred, sid))
+                  for sid in yield_curve.TENORS}
+        curve = yield_curve.YieldCurve.from_frames(frames)
+        curve.spreads, curve.shape(), curve.percentiles()
+        downsample.downsample(curve.tenor_frame("DGS10", "DGS1MO"), "Date", ["10Y", "1M"], 700)
+        return curve
+    curve = bench("dashboard.ust.prepare_5y", prepare)
+    bench("dashboard.ust.interpolate_all_dates", lambda: curve.interpolate([0.75, 3, 4, 15, 25]))
+
+def bench_equities(store_dir):
+    import data_access
+    import downsample
+    from market_data_updater import YAHOO_SYMBOLS
+    symbols = list(YAHOO_SYMBOLS)
+
+    def prepare():
+        panel = data_access.load_panel(store_dir, symbols, "1985-01-01", data_access.yahoo_batch)
+        for sym in symbols:
+            downsample.downsample(panel[sym].dropna().rename("Close").reset_index(), "Date", "Close", 400)
+        return panel
+    bench("dashboard.equities.prepare_max", prepare)
+
+def _replica(cache_path, latency, years):
+    """One cold dashboard worker: every tenor for `years` through the shared cache; returns its upstream calls."""
+    import data_access
+    import series_cache
+    import yield_curve
+    fred, cache = fixtures.FakeFred(latency=latency), series_cache.SeriesCache(cache_path)
+    since = datetime.now() - timedelta(days=years * 365)
+    for sid in yield_curve.TENORS:
+        cache.fetch("fred", [sid], since, lambda ids, sid=sid: {sid: data_access.fred_fetcher(fred, sid)(since)})
+    return fred.calls
+
+def bench_series_cache(work, latency, replicas=4):
+    from concurrent.futures import ProcessPoolExecutor
+    path = os.path.join(work, "cache", "series.sqlite")
+    calls = []
+
+    def cold():
+        with ProcessPoolExecutor(replicas) as pool:
+            calls.append(sum(pool.map(_replica, [path] * replicas, [latency] * replicas, [10] * replicas)))
+    bench(f"series_cache.{replicas}_replicas_cold_10y", cold, repeat=1,
+          setup=lambda: shutil.rmtree(os.path.dirname(path), ignore_errors=True))
+    bench("series_cache.warm_5y_from_10y", lambda: calls.append(_replica(path, latency, 5)))
+    RESULTS[f"series_cache.{replicas}_replicas_cold_10y"]["upstream_calls"] = calls[0]
+    RESULTS["series_cache.warm_5y_from_10y"]["upstream_calls"] = sum(calls[1:])
+
+def bench_analytics(work, store_dir):
+    import equity_analytics
+    from market_data_updater import YAHOO_SYMBOLS
+    out_dir = os.path.join(work, "analytics")
+    symbols = list(YAHOO_SYMBOLS)
+    bench("analytics.full_rebuild", lambda: equity_analytics.update(store_dir, out_dir, symbols, full=True),
+          repeat=1, setup=lambda: shutil.rmtree(out_dir, ignore_errors=True))
+    bench("analytics.update_up_to_date", lambda: equity_analytics.update(store_dir, out_dir, symbols))
+    bench("analytics.latest_and_correlations", lambda: (equity_analytics.latest(out_dir, symbols),
+                                                       equity_analytics.correlations(out_dir, symbols, "1Y")))
+
+def bench_sukuk(n_isins, latency):
+    import cbonds_client
+    isins = fixtures.isin_list(n_isins)
+    fake = fixtures.FakeCbonds(fixtures.cbonds_dataset(isins), latency)
+    try:
+        client = cbonds_client.CbondsClient("Test", "Test", fake.url)
+        bench(f"dashboard.sukuk.emissions_{n_isins}_isins", lambda: client.emissions(isins),
+              cbonds_latency_s=latency)
+    finally:
+        fake.close()
+
+def bench_harvester(work, n_isins, latency):
+    import cbonds_client
+    import cbonds_harvester
+    isins = fixtures.isin_list(n_isins)
+    fake = fixtures.FakeCbonds(fixtures.cbonds_dataset(isins), latency)
+    out_dir = os.path.join(work, "cbonds")
+    try:
+        client = cbonds_client.CbondsClient("Test", "Test", fake.url)
+        reset = lambda: shutil.rmtree(out_dir, ignore_errors=True)
+        bench(f"cbonds.harvest_full_{n_isins}_isins",
+              lambda: _quiet(lambda: cbonds_harvester.harvest(isins, out_dir=out_dir, client=client, rate_limit=False)),
+              repeat=1, setup=reset, cbonds_latency_s=latency)
+        bench(f"cbonds.harvest_incremental_{n_isins}_isins",
+              lambda: _quiet(lambda: cbonds_harvester.harvest(isins, out_dir=out_dir, client=client, rate_limit=False)),
+              repeat=1, cbonds_latency_s=latency)
+    finally:
+        fake.close()
+    return out_dir
+
+def bench_bonds(cbonds_dir, n_isins):
+    import bond_analytics
+    flows, prices = bond_analytics.load_flows(cbonds_dir), bond_analytics.load_prices(cbonds_dir)
+    bench(f"bonds.solve_{n_isins}_isins", lambda: bond_analytics.compute(flows, prices), quotes=len(prices))
+    bench(f"bonds.update_full_{n_isins}_isins", lambda: bond_analytics.update(cbonds_dir, full=True), repeat=1)
+    bench(f"bonds.update_up_to_date_{n_isins}_isins", lambda: bond_analytics.update(cbonds_dir))
+
+# ---------- mail ----------
+def bench_mail(n_recipients, latency):
+    import mailer
+    messages = [mailer.message("reports@example.com", f"user{i}@example.com", "Daily market report",
+                               "See attached.", html=f"<p>Report {i}</p>",
+                               attachments=[("report.csv", b"date,value\n2026-01-02,4.1\n", "text/csv")])
+                for i in range(n_recipients)]
+    smtp = fixtures.FakeSmtp(latency=latency / 10)
+    try:
+        bench(f"mail.smtp_{n_recipients}_recipients", lambda: mailer.send_smtp(
+            messages, "reports@example.com", "secret", smtp.host, smtp.port, ssl=False), repeat=1)
+        RESULTS[f"mail.smtp_{n_recipients}_recipients"]["logins"] = smtp.logins
+    finally:
+        smtp.close()
+    graph = fixtures.FakeGraph(n_drafts=n_recipients, latency=latency)
+    try:
+        client = mailer.GraphMail("token", base_url=graph.url)
+        ids = bench(f"mail.graph_list_{n_recipients}_drafts", lambda: [d["id"] for d in client.drafts()])
+        before = graph.requests
+        bench(f"mail.graph_send_{n_recipients}_drafts", lambda: client.send_drafts(ids), repeat=1)
+        RESULTS[f"mail.graph_send_{n_recipients}_drafts"]["http_requests"] = graph.requests - before
+        RESULTS[f"mail.graph_send_{n_recipients}_drafts"]["over_mailbox_limit"] = graph.over_limit
+    finally:
+        graph.close()
+
+# ---------- property ----------
+def bench_pulse(work, rows_list):
+    import pulse_agg
+    for rows in rows_list:
+        path = fixtures.pulse_parquet(os.path.join(work, f"pulse_{rows}.parquet"), rows)
+        cache_dir = os.path.join(work, f"pulse_agg_{rows}")
+        clear = lambda: shutil.rmtree(cache_dir, ignore_errors=True)
+        bench(f"pulse.area_stats_cold_{rows}", lambda: pulse_agg.area_stats(path, cache_dir), setup=clear,
+              rows=rows, bytes=os.path.getsize(path))
+        clear()
+        # streaming ingestion should stay flat as rows grow; tracked separately since tracing slows the run
+        RESULTS[f"pulse.area_stats_cold_{rows}"]["peak_mb"] = _peak_mb(lambda: pulse_agg.area_stats(path, cache_dir))
+        bench(f"pulse.area_stats_warm_{rows}", lambda: pulse_agg.area_stats(path, cache_dir), rows=rows)
+        bench(f"pulse.area_stats_3m_warm_{rows}", lambda: pulse_agg.area_stats(path, cache_dir, months=3), rows=rows)
+    return path, cache_dir
+
+def bench_matching(pulse_path, cache_dir, n_rows):
+    import pandas as pd
+    import area_matcher
+    import pulse_agg
+    import portfolio_store
+    stats = pulse_agg.area_stats(pulse_path, cache_dir)
+    aliases = pulse_agg.project_areas(pulse_path, cache_dir)
+    matcher = bench("matcher.build", lambda: area_matcher.AreaMatcher(stats.index, aliases))
+    locations = pd.Series(fixtures.portfolio_locations(n_rows))
+    bench(f"matcher.match_cold_{n_rows}",
+          lambda: area_matcher.AreaMatcher(stats.index, aliases).match_many(locations), rows=n_rows)
+    bench(f"matcher.match_memo_{n_rows}", lambda: matcher.match_many(locations), rows=n_rows)
+    holdings = pd.DataFrame({"id": range(n_rows), "Location": locations, "Price": 2_000_000.0, "Area_ft2": 900.0})
+    bench(f"portfolio.valuation_{n_rows}",
+          lambda: portfolio_store.valuation(holdings, stats["mean_psm"], matcher), rows=n_rows)
+
+# ---------- compare ----------
+def compare(old_path, new_path, threshold=0.10):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'benchmark':<44}{old['commit']:>12}{new['commit']:>12}{'ratio':>9}")
+    regressions = 0
+    for name in sorted(set(old["results"]) | set(new["results"])):
+        a, b = old["results"].get(name), new["results"].get(name)
+        if not a or not b:
+            cell = lambda r: f"{r['min_s'] * 1000:.1f}" if r else "—"
+            print(f"{name:<44}{cell(a):>12}{cell(b):>12}")
+            continue
+        ratio = b["min_s"] / a["min_s"] if a["min_s"] else float("inf")
+        flag = "  ▲" if ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"{name:<44}{a['min_s'] * 1000:>12.1f}{b['min_s'] * 1000:>12.1f}{ratio:>9.2f}{flag}")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pulse-rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--isins", type=int, default=100, help="ISINs for the Cbonds benchmarks")
+    parser.add_argument("--portfolio-rows", type=int, default=5000)
+    parser.add_argument("--recipients", type=int, default=300, help="recipients for the mail benchmarks")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated upstream latency per call (s)")
+    parser.add_argument("--work-dir", help="keep generated fixtures here (default: temp dir)")
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<sha>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(compare(*args.compare))
+
+    work = args.work_dir or tempfile.mkdtemp(prefix="mdbench-")
+    os.makedirs(work, exist_ok=True)
+    store_dir = bench_updater(work, args.latency)
+    bench_ust(store_dir)
+    bench_equities(store_dir)
+    bench_analytics(work, store_dir)
+    bench_series_cache(work, args.latency)
+    bench_sukuk(args.isins, args.latency)
+    cbonds_dir = bench_harvester(work, args.isins, args.latency)
+    bench_bonds(cbonds_dir, args.isins)
+    bench_mail(args.recipients, args.latency)
+    pulse_path, cache_dir = bench_pulse(work, args.pulse_rows)
+    bench_matching(pulse_path, cache_dir, args.portfolio_rows)
+
+    out = args.out or os.path.join(HERE, "results", f"{git_sha()}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"commit": git_sha(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+                   "python": platform.python_version(), "machine": platform.machine(),
+                   "args": vars(args), "results": RESULTS}, f, indent=2)
+    print(f"\nResults → {out}")
+    if not args.work_dir:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
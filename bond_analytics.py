@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Yield, duration, convexity and accrued interest from harvested Cbonds data.
+
+Inputs are the per-endpoint Parquet files written by cbonds_harvester:
+- flows: the coupon and redemption schedule per ISIN, in money per bond
+- tradings: daily quotes, as clean price in % of the outstanding nominal
+
+Schedules become padded bond × flow matrices. Every (ISIN, date) quote is then
+solved in one batched Newton iteration, so a whole yield history is a handful
+of array passes rather than a Python loop per bond or per day.
+
+Conventions, kept simple and stated here once:
+- settlement = trade date
+- effective annual yield over Act/365F year fractions
+- accrued interest is linear within the current coupon period, using Cbonds'
+  own coupon amount
+- bonds with no redemption in their schedule are assumed to repay the
+  nominal on the last flow date
+- rows filed under another ISIN than their own are ignored, and so are
+  ISINs whose flows span more than one emission or nominal
+
+Results live in <cbonds_dir>/bond_analytics.parquet. update() recomputes only:
+- quotes that are new or whose price changed
+- every quote of an ISIN whose flow schedule changed
+
+    python bond_analytics.py             # bring the analytics up to date
+    python bond_analytics.py --full      # recompute everything
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import cbonds_harvester
+
+RESULTS_FILE = "bond_analytics.parquet"
+PRICE_FIELDS = ("mid_price", "indicative_price", "last_price")   # first present per quote wins
+MAX_ITER = 50
+TOL = 1e-10
+CHUNK = 2048   # quotes per solver pass; small enough to stay in cache
+DAY_SPAN = 1 << 20   # (bond, payment day) sort key = bond * DAY_SPAN + epoch day
+COLUMNS = ["isin", "date", "price", "schedule", "accrued", "dirty_price", "ytm",
+           "duration", "mod_duration", "convexity"]
+
+def results_path(cbonds_dir):
+    return os.path.join(cbonds_dir, RESULTS_FILE)
+
+def _num(s):
+    return pd.to_numeric(s, errors="coerce")
+
+def _days(s):
+    return pd.to_datetime(s, errors="coerce").to_numpy().astype("datetime64[D]").astype(np.int64)
+
+# ---------- inputs ----------
+def _load(cbonds_dir, endpoint, columns):
+    """Only the `columns` present in the harvested endpoint file (the raw files are wide).
+
+    Rows whose `isin` label disagrees with the record's own ISIN field are dropped;
+    files harvested before records were labelled that way can hold other bonds' rows.
+    """
+    path = cbonds_harvester.endpoint_path(cbonds_dir, endpoint)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    own = cbonds_harvester.ENDPOINT_FIELDS[endpoint][0]
+    present = set(pq.read_schema(path).names)
+    df = cbonds_harvester.load(cbonds_dir, endpoint, columns=[c for c in dict.fromkeys([*columns, own]) if c in present])
+    if own in df and "isin" in df:
+        wrong = (df[own].astype("string") != df["isin"].astype("string")).fillna(False)
+        if wrong.any():
+            print(f"⚠️ {endpoint}: ignored {int(wrong.sum())} row(s) filed under another ISIN than their {own}")
+            df = df[~wrong]
+    return df.drop(columns=[own]) if own in df and own not in columns else df
+
+def load_flows(cbonds_dir):
+    """Cash-flow schedule: isin, start, end (epoch days), coupon, redemption, nominal (money per bond)."""
+    cols = ["isin", "emission_id", "date", "start_date", "cupon_sum", "cupon_rate", "redemtion",
+            "emission_nominal_price"]
+    raw = _load(cbonds_dir, "flows", cols).reindex(columns=cols)
+    df = pd.DataFrame({
+        "isin": raw["isin"].astype("string"),
+        "emission": raw["emission_id"].astype("string"),
+        "end": pd.to_datetime(raw["date"], errors="coerce"),
+        "start": pd.to_datetime(raw["start_date"], errors="coerce"),
+        "coupon": _num(raw["cupon_sum"]),
+        "rate": _num(raw["cupon_rate"]),
+        "redemption": _num(raw["redemtion"]).fillna(0.0),
+        "nominal": _num(raw["emission_nominal_price"]),
+    }).dropna(subset=["isin", "end"]).sort_values(["isin", "end"], kind="stable")
+    # one emission and one nominal per ISIN; anything else means two bonds' schedules got mixed
+    counts = df.groupby("isin").agg(schedules=("emission", "nunique"), nominals=("nominal", "nunique"))
+    mixed = counts.index[(counts > 1).any(axis=1)]
+    if len(mixed):
+        print(f"⚠️ flows: skipped {len(mixed)} ISIN(s) with more than one schedule or nominal: {', '.join(mixed)}")
+        df = df[~df["isin"].isin(mixed)]
+    df = df.drop(columns="emission").drop_duplicates(["isin", "end"], keep="last")
+    df["nominal"] = df.groupby("isin")["nominal"].ffill()
+    df["nominal"] = df.groupby("isin")["nominal"].bfill()
+    df = df.dropna(subset=["nominal"])
+    # a period with no start runs from the previous payment
+    df["start"] = df["start"].fillna(df.groupby("isin")["end"].shift())
+    # coupons not yet fixed: last known rate on the outstanding nominal, Act/365
+    repaid = df.groupby("isin")["redemption"].cumsum() - df["redemption"]
+    rate = df.groupby("isin")["rate"].ffill()
+    est = rate * (df["nominal"] - repaid) * (df["end"] - df["start"]).dt.days / 365
+    df["coupon"] = df["coupon"].fillna(est).fillna(0.0)
+    last = ~df["isin"].duplicated(keep="last")
+    no_redemption = df.groupby("isin")["redemption"].transform("sum") == 0
+    df.loc[last & no_redemption, "redemption"] = df.loc[last & no_redemption, "nominal"]
+    df["start"], df["end"] = _days(df["start"]), _days(df["end"])
+    return df.reset_index(drop=True)
+
+def load_prices(cbonds_dir):
+    """One clean price (% of nominal) per isin and date: the median across trading grounds."""
+    raw = _load(cbonds_dir, "tradings", ["isin", "date", *PRICE_FIELDS, "buying_quote", "selling_quote"])
+    if raw.empty or "date" not in raw:
+        return pd.DataFrame({"isin": pd.Series(dtype="string"), "date": pd.Series(dtype="datetime64[ns]"),
+                             "price": pd.Series(dtype=float)})
+    price = pd.Series(np.nan, index=raw.index)
+    for field in PRICE_FIELDS:
+        if field in raw:
+            price = price.fillna(_num(raw[field]))
+    if "buying_quote" in raw and "selling_quote" in raw:
+        price = price.fillna((_num(raw["buying_quote"]) + _num(raw["selling_quote"])) / 2)
+    df = pd.DataFrame({"isin": raw["isin"].astype("string"), "date": pd.to_datetime(raw["date"], errors="coerce"),
+                       "price": price}).dropna()
+    df = df[df["price"] > 0]
+    return df.groupby(["isin", "date"], as_index=False)["price"].median()
+
+def schedule_hashes(flows):
+    """{isin: fingerprint of its schedule}; a changed schedule invalidates every quote of that bond."""
+    h = pd.util.hash_pandas_object(flows[["end", "start", "coupon", "redemption", "nominal"]], index=False)
+    return (h.groupby(flows["isin"].to_numpy()).sum().astype(np.int64)).to_dict()
+
+# ---------- solver ----------
+class Schedules:
+    """Schedules from load_flows() as flat arrays sorted by (bond, payment date), plus padded
+    bond × flow matrices of payment dates and cash for the solver."""
+    def __init__(self, flows):
+        isin = flows["isin"].to_numpy()
+        self.index = {k: i for i, k in enumerate(pd.unique(isin))}
+        row = np.array([self.index[k] for k in isin], dtype=np.int64)
+        self.end, self.start = flows["end"].to_numpy(np.int64), flows["start"].to_numpy(np.int64)
+        self.coupon = flows["coupon"].to_numpy(float)
+        self.key = row * DAY_SPAN + self.end   # sorted, since flows are sorted by isin then date
+        self.first = np.searchsorted(row, np.arange(len(self.index) + 1))
+        self.repaid = np.concatenate([[0.0], np.cumsum(flows["redemption"].to_numpy(float))])
+        self.nominal = flows["nominal"].to_numpy(float)[self.first[:-1]] if len(row) else np.empty(0)
+        col = np.arange(len(row)) - self.first[row]
+        shape = (len(self.index), int(col.max()) + 1 if len(col) else 0)
+        self.end_m = np.full(shape, float(np.iinfo(np.int32).min))   # padding: paid before any settlement
+        self.cash_m = np.zeros(shape)
+        self.end_m[row, col] = self.end
+        self.cash_m[row, col] = self.coupon + flows["redemption"].to_numpy(float)
+
+    def solve(self, bond, settle, price):
+        """Batched analytics for quotes (bond row, settlement epoch day, clean % price); dict of arrays."""
+        out = {k: np.full(len(bond), np.nan) for k in ("accrued", "dirty_price", "ytm", "duration",
+                                                        "mod_duration", "convexity")}
+        for lo in range(0, len(bond), CHUNK):
+            part = slice(lo, lo + CHUNK)
+            for k, v in self._solve(bond[part], settle[part], price[part]).items():
+                out[k][part] = v
+        return out
+
+    def _solve(self, b, s, clean):
+        # next payment after settlement: O(1) per quote for accrued interest and outstanding nominal
+        nxt = np.searchsorted(self.key, b * DAY_SPAN + s, side="right")
+        has_next = nxt < self.first[b + 1]
+        j = np.minimum(nxt, len(self.key) - 1)
+        period = has_next & (self.start[j] <= s)
+        accrued = np.where(period, self.coupon[j] * (s - self.start[j])
+                           / np.maximum(self.end[j] - self.start[j], 1), 0.0)
+        outstanding = self.nominal[b] - (self.repaid[nxt] - self.repaid[self.first[b]])
+        dirty = clean / 100 * outstanding + accrued
+
+        end = self.end_m[b]
+        live = (end > s.min()).any(axis=0)   # drop columns already paid for every quote in the chunk
+        end, cash = end[:, live], self.cash_m[b][:, live]
+        future = end > s[:, None]
+        t = np.where(future, (end - s[:, None]) / 365.0, 0.0)
+        cash = np.where(future, cash, 0.0)
+
+        total = cash.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            wal = (cash * t).sum(axis=1) / total
+            y = np.clip((total / dirty - 1) / np.maximum(wal, 1 / 365), -0.5, 1.0)   # simple-yield start
+        ok = (total > 0) & (dirty > 0) & np.isfinite(y)
+        y = np.where(ok, y, 0.0)
+        dirty_ok = np.where(ok, dirty, total)
+        converged = np.zeros(len(y), dtype=bool)
+        # all rows step together; converged rows just take ~0 steps, which beats re-slicing the matrices
+        for _ in range(MAX_ITER):
+            v = np.exp(-t * np.log1p(y)[:, None])
+            cv = cash * v
+            step = ((cv.sum(axis=1) - dirty_ok) * (1 + y)) / -(cv * t).sum(axis=1)
+            step = np.where(np.isfinite(step), step, 0.0)
+            y = np.clip(y - step, -0.99, 10.0)
+            converged = np.abs(step) < TOL
+            if converged.all():
+                break
+        cv = cash * np.exp(-t * np.log1p(y)[:, None])
+        pv = cv.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            duration = (cv * t).sum(axis=1) / pv
+            convexity = (cv * t * (t + 1)).sum(axis=1) / (pv * (1 + y) ** 2)
+            res = {"accrued": accrued, "dirty_price": dirty / outstanding * 100, "ytm": y, "duration": duration,
+                   "mod_duration": duration / (1 + y), "convexity": convexity}
+        bad = ~ok | ~converged   # no future cash, bad price, or Newton did not converge
+        for k in ("ytm", "duration", "mod_duration", "convexity"):
+            res[k] = np.where(bad, np.nan, res[k])
+        return res
+
+def compute(flows, prices):
+    """Analytics for every quote in `prices` whose ISIN has a schedule in `flows`."""
+    sched = Schedules(flows)
+    prices = prices[prices["isin"].isin(sched.index.keys())].reset_index(drop=True)
+    bond = prices["isin"].map(sched.index).to_numpy(dtype=np.int64)
+    res = sched.solve(bond, _days(prices["date"]), prices["price"].to_numpy(dtype=float))
+    hashes = schedule_hashes(flows)
+    return prices.assign(schedule=prices["isin"].map(hashes).astype(np.int64), **res)[COLUMNS]
+
+# ---------- store ----------
+def load(cbonds_dir, isins=None):
+    path = results_path(cbonds_dir)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=COLUMNS)
+    df = pd.read_parquet(path, filters=[("isin", "in", list(isins))] if isins is not None else None)
+    return df.astype({"isin": "string"})
+
+def update(cbonds_dir=cbonds_harvester.OUT_DIR, full=False):
+    """Recompute new/changed quotes and re-priced schedules; returns {isin: rows recomputed}."""
+    flows, prices = load_flows(cbonds_dir), load_prices(cbonds_dir)
+    prices = prices[prices["isin"].isin(set(flows["isin"]))]
+    old = None if full else load(cbonds_dir)
+    if old is None or old.empty:
+        result = fresh = compute(flows, prices)
+    else:
+        merged = prices.merge(old[["isin", "date", "price", "schedule"]], on=["isin", "date"], how="left",
+                              suffixes=("", "_old"))
+        stale = (merged["price_old"].isna() | (merged["price_old"] != merged["price"])
+                 | (merged["schedule"] != merged["isin"].map(schedule_hashes(flows)))).to_numpy()
+        if not stale.any() and len(old) == len(prices):
+            return {}
+        fresh = compute(flows, merged.loc[stale, ["isin", "date", "price"]])
+        keep = old.merge(merged.loc[~stale, ["isin", "date"]], on=["isin", "date"])
+        result = pd.concat([keep, fresh], ignore_index=True)
+    result = result.sort_values(["isin", "date"], ignore_index=True)
+    os.makedirs(cbonds_dir, exist_ok=True)
+    path = results_path(cbonds_dir)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    result.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return fresh.groupby("isin").size().to_dict()
+
+# ---------- read side ----------
+def latest(cbonds_dir, isins):
+    """Most recent analytics row per ISIN, indexed by ISIN."""
+    df = load(cbonds_dir, isins)
+    return df.sort_values("date").groupby("isin").tail(1).set_index("isin")
+
+def history(cbonds_dir, isins, column="ytm"):
+    """Date × ISIN frame of one analytics column."""
+    df = load(cbonds_dir, isins)
+    return df.pivot(index="date", columns="isin", values=column).sort_index()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update bond yields/durations from harvested Cbonds data.")
+    parser.add_argument("--dir", default=cbonds_harvester.OUT_DIR, help="harvested Cbonds Parquet folder")
+    parser.add_argument("--full", action="store_true", help="recompute every quote")
+    args = parser.parse_args()
+    changed = update(args.dir, args.full)
+    print(f"[BONDS] {sum(changed.values())} quotes recomputed for {len(changed)} ISINs → {results_path(args.dir)}")
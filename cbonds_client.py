@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Pooled Cbonds JSON API client.
+
+One requests.Session with a sized connection pool is shared by all calls.
+Emission lookups for many ISINs go out as a single `in` filter request. Any
+ISIN the batch does not return is retried with per-ISIN requests, run
+concurrently over the same pool.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_BASE = "https://ws.cbonds.info/services/json/"
+POOL_SIZE = 6
+TIMEOUT = 20
+
+def item_isin(item):
+    return item.get("isin_code") or item.get("isin") or item.get("emission_isin_code")
+
+class LookupFailed(RuntimeError):
+    """Some ISINs could not be looked up; `rows` holds what did come back, `errors` is {isin: message}."""
+    def __init__(self, rows, errors):
+        super().__init__(f"{len(errors)} Cbonds lookup(s) failed")
+        self.rows, self.errors = rows, errors
+
+class CbondsClient:
+    def __init__(self, login, password, base_url=API_BASE, pool_size=POOL_SIZE, timeout=TIMEOUT):
+        self.auth = {"login": login, "password": password}
+        self.base_url = base_url.rstrip("/") + "/"
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=None)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def query(self, method, filters, limit=1000, offset=0, sorting=None):
+        """POST one Cbonds query and return the decoded JSON body."""
+        payload = {"auth": self.auth, "filters": filters, "quantity": {"limit": limit, "offset": offset}}
+        if sorting:
+            payload["sorting"] = sorting
+        r = self.session.post(self.base_url + method, json=payload, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def _emission(self, isin):
+        js = self.query("get_emissions", [{"field": "isin_code", "operator": "eq", "value": isin}], limit=20)
+        return next((e for e in js.get("items") or [] if item_isin(e) == isin), None)
+
+    def emissions(self, isins):
+        """Return ({isin: emission item}, {isin: error message}) for the requested ISINs."""
+        isins = list(dict.fromkeys(isins))
+        found, errors = {}, {}
+        try:
+            js = self.query("get_emissions", [{"field": "isin_code", "operator": "in", "value": ";".join(isins)}],
+                            limit=max(len(isins), 20))
+            for e in js.get("items") or []:
+                if item_isin(e) in isins:
+                    found.setdefault(item_isin(e), e)
+        except Exception as e:
+            print(f"[WARN] Cbonds batch lookup failed ({e}); falling back to per-ISIN requests")
+
+        missing = [i for i in isins if i not in found]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.pool_size, len(missing))) as pool:
+                futures = {isin: pool.submit(self._emission, isin) for isin in missing}
+            for isin, fut in futures.items():
+                try:
+                    match = fut.result()
+                    if match:
+                        found[isin] = match
+                except Exception as e:
+                    errors[isin] = str(e)
+        return found, errors
+
+def emission_row(isin, e):
+    """Flatten an emission item into the Sukuk table row."""
+    return {
+        "ISIN": isin,
+        "Issuer": e.get("issuer_name_eng") or e.get("emitent_name_eng", ""),
+        "Coupon": e.get("coupon") or e.get("curr_coupon_rate") or e.get("emission_coupon_rate", ""),
+        "Maturity": e.get("maturity_date", ""),
+        "Currency": e.get("currency_name", ""),
+    }
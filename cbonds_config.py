@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""Cbonds settings shared by the dashboard, the harvester and the updater daemon.
+
+SUKUK_ISINS is the watchlist: the bonds the dashboard's Sukuk section shows
+and the ones the daemon harvests. Edit it here only.
+"""
+
+# === Sukuk watchlist ===
+SUKUK_ISINS = ["XS0975256683", "XS2595679111", "XS1809986734", "XS2396609819", "XS2506541443", "XS2069132036"]
+
+# === Harvested endpoints: API method per endpoint ===
+ENDPOINTS = {
+    "emissions": "get_emissions",
+    "flows": "get_flow_new",
+    "offers": "get_offert",
+    "tradings": "get_tradings_new",
+}
+
+# Demo credentials; override with CBONDS_LOGIN / CBONDS_PASSWORD
+AUTH = {"login": "Test", "password": "Test"}
+
+OUT_DIR = "/Users/Timur/Documents/PythonProjects/MarketData/data/processed/cbonds"   # harvested Parquet files
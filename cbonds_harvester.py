@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Incremental bulk harvester for Cbonds endpoints.
+
+Each endpoint×ISIN query follows `offset` pagination until the reported `total`
+is reached. Queries run in parallel, and every request first takes a token
+from its endpoint's bucket, so each endpoint stays within Cbonds' 30
+requests/minute. On reruns only records whose change-date field is on or after
+the last stored value for that ISIN are requested. Results are stored as one
+zstd-compressed Parquet file per endpoint (<out_dir>/<endpoint>.parquet),
+de-duplicated by record id and ISIN.
+
+Records are filed under their own ISIN field, never under the ISIN that was
+asked for: upstream has ignored filters before (the legacy JSON dumps hold
+unrelated bonds), and such records are dropped.
+"""
+import os
+import glob
+import json
+import time
+import tempfile
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from cbonds_config import ENDPOINTS, SUKUK_ISINS as ISINS, OUT_DIR, AUTH
+from cbonds_client import CbondsClient, item_isin
+
+PAGE_SIZE = 1000
+MAX_WORKERS = 4          # concurrent queries; the request rate is set by the buckets below
+RATE_PER_MINUTE = 30     # Cbonds' throttle, per endpoint
+
+# endpoint: (ISIN filter field, change-date field used for incremental reruns)
+ENDPOINT_FIELDS = {
+    "emissions": ("isin_code", "updating_date"),
+    "offers": ("emission_isin_code", "updating_date"),
+    "flows": ("emission_isin_code", "updated_at"),
+    "tradings": ("isin_code", "updated_at"),
+}
+
+class TokenBucket:
+    """`rate` requests per `per` seconds, evenly spaced (burst of one). acquire() sleeps until a token is free."""
+    def __init__(self, rate, per=60.0):
+        self.interval = per / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+# one bucket per endpoint, shared by every harvest in the process
+_buckets = {ep: TokenBucket(RATE_PER_MINUTE) for ep in ENDPOINT_FIELDS}
+
+def endpoint_path(out_dir, endpoint):
+    return os.path.join(out_dir, f"{endpoint}.parquet")
+
+def load(out_dir, endpoint, columns=None):
+    """Stored records for an endpoint (optionally only some columns)."""
+    path = endpoint_path(out_dir, endpoint)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns or [])
+    return pd.read_parquet(path, columns=columns)
+
+def last_changes(out_dir, endpoint):
+    """{isin: last change date} from the stored Parquet (reads two columns)."""
+    change_field = ENDPOINT_FIELDS[endpoint][1]
+    try:
+        df = load(out_dir, endpoint, columns=["isin", change_field])
+    except Exception:
+        return {}
+    if df.empty:
+        return {}
+    return df.dropna().groupby("isin")[change_field].max().str[:10].to_dict()
+
+def fetch_all(client, endpoint, isin, since=None, page_size=PAGE_SIZE, bucket=None):
+    """Fetch every page of `endpoint` for one ISIN (changed on/after `since` if given).
+
+    Each page waits for a token from `bucket` (pass None to skip rate limiting).
+    """
+    isin_field, change_field = ENDPOINT_FIELDS[endpoint]
+    filters = [{"field": isin_field, "operator": "eq", "value": isin}]
+    if since:
+        filters.append({"field": change_field, "operator": "ge", "value": since})
+    items, offset = [], 0
+    while True:
+        if bucket:
+            bucket.acquire()
+        js = client.query(ENDPOINTS[endpoint], filters, limit=page_size, offset=offset)
+        page = js.get("items") or []
+        items.extend(page)
+        offset += len(page)
+        if not page or offset >= int(js.get("total") or 0):
+            break
+    return items
+
+def save(out_dir, endpoint, records, isins=None):
+    """Merge raw records into the endpoint's Parquet file; returns rows added or changed.
+
+    Each record is labelled with its own ISIN field. Records without one, or
+    (when `isins` is given) with one outside that set, are dropped.
+    """
+    labels = [item_isin(r) for r in records]
+    keep = [lab is not None and (isins is None or lab in isins) for lab in labels]
+    if len(keep) - sum(keep):
+        print(f"⚠️ {endpoint}: dropped {len(keep) - sum(keep)} record(s) for ISINs that weren't requested")
+    records = [dict(r, isin=lab) for r, lab, k in zip(records, labels, keep) if k]
+    if not records:
+        return 0
+    new = pd.DataFrame.from_records(records).astype("string")
+    key = ["id", "isin"] if "id" in new else None
+    new = new.drop_duplicates(subset=key, keep="last")
+    path = endpoint_path(out_dir, endpoint)
+    old = load(out_dir, endpoint)
+    if old.empty:
+        merged, changed = new, len(new)
+    else:
+        old = old.astype("string")
+        cols = list(dict.fromkeys([*old.columns, *new.columns]))
+        # a new row that matches a stored row on every column changes nothing
+        seen = new.reindex(columns=cols).merge(old.reindex(columns=cols).drop_duplicates(), on=cols,
+                                               how="left", indicator=True)
+        changed = int((seen["_merge"] == "left_only").sum())
+        if not changed:
+            return 0
+        merged = pd.concat([old, new], ignore_index=True).drop_duplicates(subset=key, keep="last")
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out_dir, prefix=f"{endpoint}.parquet.tmp-")
+    os.close(fd)
+    merged.to_parquet(tmp, index=False, compression="zstd")
+    os.replace(tmp, path)
+    return changed
+
+def default_client():
+    return CbondsClient(os.getenv("CBONDS_LOGIN", AUTH["login"]), os.getenv("CBONDS_PASSWORD", AUTH["password"]))
+
+def harvest(isins=ISINS, endpoints=tuple(ENDPOINT_FIELDS), out_dir=OUT_DIR, client=None, full=False,
+            max_workers=MAX_WORKERS, rate_limit=True):
+    """Fetch endpoint×ISIN pairs in parallel and merge them into the per-endpoint store.
+
+    Returns ({endpoint: rows changed}, {"<endpoint>:<isin>": error}).
+    """
+    client = client or default_client()
+    since = {ep: {} if full else last_changes(out_dir, ep) for ep in endpoints}
+    # ISIN-major order keeps every endpoint's bucket busy instead of draining one endpoint at a time
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {(ep, isin): pool.submit(fetch_all, client, ep, isin, since[ep].get(isin),
+                                           bucket=_buckets.get(ep) if rate_limit else None)
+                   for isin in isins for ep in endpoints}
+    changed, errors = {}, {}
+    for ep in endpoints:
+        records = []
+        for isin in isins:
+            try:
+                records += futures[(ep, isin)].result()
+            except Exception as e:
+                print(f"⚠️ {ep} failed for {isin}: {e}")
+                errors[f"{ep}:{isin}"] = repr(e)
+        changed[ep] = save(out_dir, ep, records, set(isins))
+        print(f"💾 {ep}: {changed[ep]} new/updated records → {endpoint_path(out_dir, ep)}")
+    return changed, errors
+
+def import_json(out_dir=OUT_DIR, isins=ISINS):
+    """Fold legacy per-ISIN JSON dumps into the per-endpoint Parquet files.
+
+    The file name is not trusted: records are filed under their own ISIN, and
+    only those in `isins` are kept.
+    """
+    by_endpoint = {}
+    for path in sorted(glob.glob(os.path.join(out_dir, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            dump = json.load(f)
+        for ep, js in dump.items():
+            by_endpoint.setdefault(ep, []).extend((js or {}).get("items") or [])
+    for ep, records in by_endpoint.items():
+        print(f"💾 {ep}: imported {save(out_dir, ep, records, set(isins))} records")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Harvest Cbonds endpoints into Parquet.")
+    parser.add_argument("--isins-file", help="text file with one ISIN per line (default: the Sukuk watchlist)")
+    parser.add_argument("--full", action="store_true", help="ignore stored change dates and refetch everything")
+    parser.add_argument("--import-json", action="store_true", help="convert legacy <ISIN>.json dumps and exit")
+    args = parser.parse_args()
+    isins = ISINS
+    if args.isins_file:
+        with open(args.isins_file) as f:
+            isins = [line.strip() for line in f if line.strip()]
+    if args.import_json:
+        import_json(isins=isins)
+    else:
+        harvest(isins, full=args.full)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Local-first series access for the dashboard.
+
+Series are served from the Parquet store written by market_data_updater.py.
+The network is only used to fill the gap after the last stored date. That call
+runs under a timeout, and any failure falls back to the stale local data.
+
+When an `on_update` callback is given and local data exists, the top-up never
+blocks (stale-while-revalidate). The stored rows are returned at once and the
+gap is fetched in the background. After the gap is written, on_update({id: rows})
+is called so the caller can publish a new snapshot version.
+
+With a `cache` (series_cache.SeriesCache), gap fetches go through the
+cross-process upstream cache. Replicas and restarts then share one upstream
+call per series and TTL, instead of each asking for the same gap.
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import ts_store
+
+NETWORK_TIMEOUT = 8      # seconds allowed for one upstream gap fetch
+YAHOO_TIMEOUT = 20       # socket timeout for a Yahoo download
+RETRY_AFTER = 15 * 60    # don't re-ask upstream for the same series more often than this
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gapfetch")
+_last_attempt = {}
+_failed = set()
+_lock = threading.Lock()
+
+def expected_last_date(today=None):
+    """Most recent business day whose observation should already be published."""
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    return today - pd.offsets.BDay(1)
+
+def _due(series_id):
+    with _lock:
+        now = time.monotonic()
+        if now - _last_attempt.get(series_id, -RETRY_AFTER) < RETRY_AFTER:
+            return False
+        _last_attempt[series_id] = now
+        return True
+
+def _write_gaps(store_dir, gaps):
+    """Write {series_id: frame} to the store; returns {series_id: rows changed}."""
+    return {sid: ts_store.write_series(store_dir, sid, gap) for sid, gap in gaps.items()
+            if gap is not None and not gap.empty}
+
+def _fetch_gaps(store_dir, fetch):
+    """fetch() and store the gaps; returns ({series_id: rows changed}, ids left unanswered)."""
+    gaps = fetch()
+    return _write_gaps(store_dir, gaps), {sid for sid, gap in gaps.items() if gap is None}
+
+def _settle(series_ids, failed):
+    """Mark `failed` as stale and the rest of `series_ids` as fresh; runs from pool callbacks too."""
+    with _lock:
+        _failed.difference_update(set(series_ids) - set(failed))
+        _failed.update(failed)
+
+def _top_up(store_dir, series_ids, fetch, background, on_update, timeout):
+    """Run fetch() (-> {series_id: gap frame}) and store it; True if the store changed.
+
+    A None frame means upstream wasn't asked (the shared cache is backing off
+    after a failure), so that series is reported stale like a failed fetch.
+    In background mode this returns None at once and reports through on_update.
+    """
+    label = ", ".join(series_ids)
+    fut = _pool.submit(_fetch_gaps, store_dir, fetch)
+    if background:
+        def done(f):
+            try:
+                changed, unanswered = f.result()
+                _settle(series_ids, unanswered)
+            except Exception as e:
+                print(f"[WARN] {label}: background top-up failed ({e!r})")
+                _settle(series_ids, series_ids)
+                return
+            if any(changed.values()):
+                on_update(changed)
+        fut.add_done_callback(done)
+        return None
+    try:
+        changed, unanswered = fut.result(timeout=timeout)
+        _settle(series_ids, unanswered)
+        return any(changed.values())
+    except Exception as e:
+        print(f"[WARN] {label}: upstream top-up failed ({e!r}); serving local data")
+        _settle(series_ids, series_ids)
+        return False
+
+def _through(cache, source, series_ids, since, fetch):
+    """fetch(series_ids) -> {id: frame}, served from / recorded in the shared cache when one is given."""
+    if cache is None:
+        return lambda: fetch(series_ids)
+    return lambda: cache.fetch(source, series_ids, since, fetch)
+
+def load_series(store_dir, series_id, start, fetch_gap, timeout=NETWORK_TIMEOUT, on_update=None,
+                cache=None, source="fred"):
+    """Return (date, value) rows from `start`, topping up the store from upstream if behind.
+
+    `fetch_gap(since)` must return a (date, value) frame of observations on or
+    after `since`; pass None to serve the store only. The result's attrs carry
+    `as_of` (last date), `stale` (True when the upstream top-up was needed but
+    failed or timed out) and `refreshing` (a background top-up is in flight).
+    Gap fetches are shared through `cache` under `source` when a cache is given.
+    """
+    start = pd.Timestamp(start)
+    local = ts_store.read_series(store_dir, series_id, start=start)
+    last = ts_store.last_date(store_dir, series_id)
+    behind = last is None or last < expected_last_date()
+    refreshing = False
+    if behind and fetch_gap is not None and _due(series_id):
+        since = start if last is None else max(start, last + pd.Timedelta(days=1))
+        refreshing = on_update is not None and not local.empty
+        fetch = _through(cache, source, [series_id], since, lambda ids: {series_id: fetch_gap(since)})
+        if _top_up(store_dir, [series_id], fetch, refreshing, on_update, timeout):
+            local = ts_store.read_series(store_dir, series_id, start=start)
+    local.attrs["as_of"] = local["date"].max() if not local.empty else None
+    local.attrs["stale"] = behind and series_id in _failed
+    local.attrs["refreshing"] = refreshing
+    return local
+
+def fred_fetcher(fred, series_id):
+    """Gap fetcher for a FRED series."""
+    def fetch(since):
+        s = fred.get_series(series_id, observation_start=since)
+        return pd.DataFrame({"date": s.index, "value": s.values})
+    return fetch
+
+def load_panel(store_dir, symbols, start, fetch_batch, timeout=NETWORK_TIMEOUT, on_update=None,
+               cache=None, source="yahoo"):
+    """Date × symbol close panel from the store, topped up with one batched upstream call.
+
+    `fetch_batch(symbols, since)` returns {symbol: (date, value) frame}. Only
+    symbols that are behind are requested, from the earliest gap among them.
+    attrs carry `as_of`, `stale` and `refreshing` like load_series(). With a
+    cache, only symbols without a fresh cached answer reach upstream.
+    """
+    start = pd.Timestamp(start)
+    symbols = list(symbols)
+    lasts = {sym: ts_store.last_date(store_dir, sym) for sym in symbols}
+    behind = [sym for sym in symbols if lasts[sym] is None or lasts[sym] < expected_last_date()]
+    due = [sym for sym in behind if fetch_batch is not None and _due(sym)]
+    refreshing = False
+    if due:
+        since = min(start if lasts[sym] is None else max(start, lasts[sym] + pd.Timedelta(days=1)) for sym in due)
+        refreshing = on_update is not None and all(lasts[sym] is not None for sym in symbols)
+        fetch = _through(cache, source, due, since, lambda ids: fetch_batch(ids, since))
+        _top_up(store_dir, due, fetch, refreshing, on_update, timeout)
+    cols = {sym: ts_store.read_series(store_dir, sym, start=start).set_index("date")["value"] for sym in symbols}
+    panel = pd.DataFrame(cols).sort_index()
+    panel.index.name = "Date"
+    panel.attrs["as_of"] = panel.index.max() if len(panel) else None
+    panel.attrs["stale"] = any(sym in _failed for sym in behind)
+    panel.attrs["refreshing"] = refreshing
+    return panel
+
+def yahoo_batch(symbols, since=None):
+    """One multi-ticker Yahoo download, normalized to {symbol: (date, value) frame} of closes."""
+    import yfinance as yf
+    symbols = list(symbols)
+    kwargs = {"start": since} if since is not None else {"period": "max"}
+    df = yf.download(symbols, interval="1d", progress=False, auto_adjust=True, group_by="column",
+                     timeout=YAHOO_TIMEOUT, **kwargs)
+    if df.empty:
+        return {}
+    if isinstance(df.columns, pd.MultiIndex):
+        close = df["Close"]
+    else:
+        close = df[["Close"]].set_axis(symbols[:1], axis=1)
+    dates = pd.to_datetime(close.index).tz_localize(None).normalize()
+    return {sym: pd.DataFrame({"date": dates, "value": close[sym].to_numpy()}).dropna()
+            for sym in symbols if sym in close.columns}
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Chart downsampling: largest-triangle-three-buckets (LTTB) and min/max per bucket.
+
+Series are thinned to roughly one point per horizontal pixel before they go
+to Plotly, so peaks and troughs survive but the browser payload stays small.
+Results are memoized in a small LRU keyed by (series key, range, width).
+"""
+from collections import OrderedDict
+import threading
+import numpy as np
+import pandas as pd
+
+CACHE_SIZE = 128
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+def lttb(x, y, n_out):
+    """Indices of the `n_out` points LTTB keeps from (x, y); x must be increasing."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # n_out-2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    starts, ends = edges[:-1], edges[1:]
+    sizes = np.maximum(ends - starts, 1)
+    avg_x = np.add.reduceat(x[:-1], starts) / sizes
+    avg_y = np.add.reduceat(y[:-1], starts) / sizes
+    avg_x = np.append(avg_x[1:], x[-1])   # average of the *next* bucket for each bucket
+    avg_y = np.append(avg_y[1:], y[-1])
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b, (s, e) in enumerate(zip(starts, ends)):
+        xs, ys = x[s:e], y[s:e]
+        area = np.abs((x[a] - avg_x[b]) * (ys - y[a]) - (x[a] - xs) * (avg_y[b] - y[a]))
+        a = s + int(np.argmax(area)) if len(area) else s
+        out[b + 1] = a
+    return out
+
+def minmax(y, n_out):
+    """Indices of each bucket's min and max (≈ n_out points), plus both endpoints."""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    buckets = n_out // 2
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    idx = [0, n - 1]
+    for s, e in zip(edges[:-1], edges[1:]):
+        if e > s:
+            idx += [s + int(np.argmin(y[s:e])), s + int(np.argmax(y[s:e]))]
+    return np.unique(idx)
+
+def downsample(df, x, ys, n_out, method="lttb"):
+    """Rows of `df` kept for charting every column in `ys` at about `n_out` points each."""
+    if len(df) <= n_out:
+        return df
+    xv = pd.to_datetime(df[x]).to_numpy().astype("int64") if not np.issubdtype(df[x].dtype, np.number) else df[x].to_numpy()
+    keep = []
+    for col in [ys] if isinstance(ys, str) else ys:
+        yv = df[col].to_numpy(dtype=float)
+        ok = np.flatnonzero(~np.isnan(yv))
+        picked = lttb(xv[ok], yv[ok], n_out) if method == "lttb" else minmax(yv[ok], n_out)
+        keep.append(ok[picked])
+    return df.iloc[np.unique(np.concatenate(keep))]
+
+def downsample_cached(key, df, x, ys, n_out, method="lttb"):
+    """downsample() memoized by `key` (e.g. (series ids, range, data as-of), width)."""
+    k = (key, n_out, method)
+    with _lock:
+        if k in _cache:
+            _cache.move_to_end(k)
+            return _cache[k]
+    out = downsample(df, x, ys, n_out, method)
+    with _lock:
+        _cache[k] = out
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return out
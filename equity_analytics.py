@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Incremental rolling analytics for equity index closes.
+
+Metrics are derived from the close series in the Parquet store and written
+back as series in their own ts_store root. Series ids look like "<symbol>.<metric>":
+- ret_<w>: simple return over the window
+- vol_<w>: annualized realized volatility of daily log returns
+- drawdown: close vs. running peak
+- max_drawdown: worst drawdown to date
+
+A small state file keeps, per symbol, the last TAIL closes, the running peak
+and the worst drawdown. An append therefore only touches O(window + new rows),
+never the full history. Correlations across symbols come from the same tails.
+
+    python equity_analytics.py ^GSPC ^IXIC ^DJI      # bring the analytics up to date
+"""
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import ts_store
+
+RETURN_WINDOWS = {"1M": 21, "3M": 63, "6M": 126, "1Y": 252}
+VOL_WINDOWS = {"1M": 21, "3M": 63, "1Y": 252}
+CORR_WINDOWS = {"3M": 63, "1Y": 252}
+TRADING_DAYS = 252
+TAIL = max(max(RETURN_WINDOWS.values()), max(VOL_WINDOWS.values()), max(CORR_WINDOWS.values())) + 1
+STATE_FILE = "state.json"
+
+METRICS = ([f"ret_{k}" for k in RETURN_WINDOWS] + [f"vol_{k}" for k in VOL_WINDOWS]
+           + ["drawdown", "max_drawdown"])
+
+def series_id(symbol, metric):
+    return f"{symbol}.{metric}"
+
+# ---------- vectorized kernels ----------
+def _window_returns(x, k, w):
+    """x[i] / x[i-w] - 1 for i in k..len(x)-1 (NaN where the window is not full)."""
+    idx = np.arange(k, len(x))
+    out = np.full(len(idx), np.nan)
+    ok = idx >= w
+    out[ok] = x[idx[ok]] / x[idx[ok] - w] - 1
+    return out
+
+def _window_vol(x, k, w):
+    """Annualized std of the w log returns ending at each i in k..len(x)-1."""
+    r = np.diff(np.log(x))
+    c1 = np.concatenate([[0.0], np.cumsum(r)])
+    c2 = np.concatenate([[0.0], np.cumsum(r * r)])
+    idx = np.arange(k, len(x))
+    out = np.full(len(idx), np.nan)
+    ok = idx >= w
+    i = idx[ok]
+    s1, s2 = c1[i] - c1[i - w], c2[i] - c2[i - w]
+    out[ok] = np.sqrt(np.maximum(s2 - s1 * s1 / w, 0.0) / (w - 1) * TRADING_DAYS)
+    return out
+
+def compute(tail, new, peak=-np.inf, worst=0.0):
+    """Metrics for the `new` closes given the previous `tail` closes and running peak / worst drawdown.
+
+    Returns ({metric: array aligned with new}, new_peak, new_worst). The cost is
+    O(len(tail) + len(new)); history before the tail is never needed.
+    """
+    tail, new = np.asarray(tail, dtype=float), np.asarray(new, dtype=float)
+    x, k = np.concatenate([tail, new]), len(tail)
+    out = {f"ret_{name}": _window_returns(x, k, w) for name, w in RETURN_WINDOWS.items()}
+    out.update({f"vol_{name}": _window_vol(x, k, w) for name, w in VOL_WINDOWS.items()})
+    peaks = np.maximum.accumulate(np.concatenate([[peak], new]))[1:]
+    dd = new / peaks - 1
+    out["drawdown"] = dd
+    out["max_drawdown"] = np.minimum.accumulate(np.concatenate([[worst], dd]))[1:]
+    return out, float(peaks[-1]) if len(new) else peak, float(out["max_drawdown"][-1]) if len(new) else worst
+
+# ---------- state ----------
+def load_state(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(out_dir, state):
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, STATE_FILE)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def _closes(store_dir, symbol, start=None):
+    df = ts_store.read_series(store_dir, symbol, start=start).dropna(subset=["value"])
+    return df[df["value"] > 0]
+
+def update_symbol(store_dir, out_dir, symbol, state, full=False):
+    """Append metrics for closes after the symbol's saved state; returns rows written.
+
+    If stored closes inside the saved tail were revised, the symbol is rebuilt from scratch.
+    """
+    st = None if full else state.get(symbol)
+    if st:
+        df = _closes(store_dir, symbol, start=st["dates"][0])
+        seen = df[df["date"] <= pd.Timestamp(st["last_date"])]
+        if len(seen) != len(st["closes"]) or not np.allclose(seen["value"].to_numpy(), st["closes"]):
+            print(f"[ANALYTICS] {symbol}: history revised inside the window; rebuilding")
+            return update_symbol(store_dir, out_dir, symbol, state, full=True)
+        df = df[df["date"] > pd.Timestamp(st["last_date"])]
+        tail, peak, worst = np.asarray(st["closes"]), st["peak"], st["max_drawdown"]
+        dates = pd.to_datetime(st["dates"])
+    else:
+        df = _closes(store_dir, symbol)
+        tail, peak, worst, dates = np.empty(0), -np.inf, 0.0, pd.DatetimeIndex([])
+    if df.empty:
+        return 0
+    metrics, peak, worst = compute(tail, df["value"].to_numpy(), peak, worst)
+    for metric, values in metrics.items():
+        ts_store.write_series(out_dir, series_id(symbol, metric), pd.DataFrame({"date": df["date"], "value": values}))
+    all_dates = dates.append(pd.DatetimeIndex(df["date"]))[-TAIL:]
+    state[symbol] = {
+        "last_date": f"{all_dates[-1]:%Y-%m-%d}",
+        "dates": [f"{d:%Y-%m-%d}" for d in all_dates],
+        "closes": np.concatenate([tail, df["value"].to_numpy()])[-TAIL:].tolist(),
+        "peak": peak,
+        "max_drawdown": worst,
+    }
+    return len(df)
+
+def update(store_dir, out_dir, symbols, full=False):
+    """Bring analytics for `symbols` up to date; returns {symbol: new rows}."""
+    state = load_state(out_dir)
+    changed = {sym: update_symbol(store_dir, out_dir, sym, state, full) for sym in symbols}
+    save_state(out_dir, state)
+    return changed
+
+# ---------- read side ----------
+def latest(out_dir, symbols):
+    """symbol × metric table of the most recent values (reads only the last year partition)."""
+    start = pd.Timestamp.today() - pd.DateOffset(years=1)
+    rows = {}
+    for sym in symbols:
+        row = {}
+        for metric in METRICS:
+            df = ts_store.read_series(out_dir, series_id(sym, metric), start=start)
+            row[metric] = df["value"].iloc[-1] if len(df) else np.nan
+        rows[sym] = row
+    return pd.DataFrame.from_dict(rows, orient="index")[METRICS]
+
+def panel(out_dir, symbols, metric, start=None):
+    """Date × symbol frame of one metric."""
+    cols = {sym: ts_store.read_series(out_dir, series_id(sym, metric), start=start).set_index("date")["value"]
+            for sym in symbols}
+    out = pd.DataFrame(cols).sort_index()
+    out.index.name = "Date"
+    return out
+
+def correlations(out_dir, symbols, window="3M"):
+    """Correlation of daily log returns over the last CORR_WINDOWS[window] common dates, from the saved tails."""
+    w = CORR_WINDOWS[window]
+    state = load_state(out_dir)
+    closes = pd.DataFrame({sym: pd.Series(state[sym]["closes"], index=pd.to_datetime(state[sym]["dates"]))
+                           for sym in symbols if sym in state})
+    rets = np.log(closes.dropna()).diff().dropna().tail(w)
+    if len(rets) < 3:
+        return pd.DataFrame(index=closes.columns, columns=closes.columns, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):   # flat series → NaN, not a warning
+        return pd.DataFrame(np.corrcoef(rets.to_numpy().T), index=rets.columns, columns=rets.columns)
+
+def load(out_dir, symbols):
+    """(latest table, {window: correlation}) as last written by update(); never writes."""
+    return latest(out_dir, symbols), {w: correlations(out_dir, symbols, w) for w in CORR_WINDOWS}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update rolling equity analytics from the series store.")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--store", default=os.path.expanduser("~/Documents/PythonProjects/MarketData/data/processed/store"))
+    parser.add_argument("--out", default=os.path.expanduser("~/Documents/PythonProjects/MarketData/data/processed/analytics"))
+    parser.add_argument("--full", action="store_true", help="rebuild from the full history")
+    args = parser.parse_args()
+    for sym, n in update(args.store, args.out, args.symbols, args.full).items():
+        print(f"[ANALYTICS] {sym}: {n} new rows")
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""Outbound mail for dashboard reports and alerts.
+
+- SMTP: send_smtp() logs in once per session and reuses that session for up
+  to SESSION_MESSAGES messages. A batch is spread over a few parallel
+  sessions, and a dropped session is reconnected once.
+- Microsoft Graph: GraphMail shares one pooled requests.Session. Drafts are
+  listed page by page (@odata.nextLink). Sends and creates go out in $batch
+  requests of GRAPH_BATCH, chained with dependsOn into GRAPH_CONCURRENCY
+  parallel lanes, since Graph runs at most that many requests per mailbox at
+  once. A throttled sub-request (429/503) is retried after its Retry-After.
+- GraphAuth keeps MSAL's token cache on disk (mode 600) and refreshes
+  silently, so the browser sign-in only happens when the refresh token is
+  gone. The redirect listener sets a threading.Event, so the caller sleeps
+  instead of polling.
+
+Hosts and URLs are parameters, so all of this runs against the local
+stand-ins in benchmarks/fixtures.py.
+
+    python mailer.py report.html --subject "Daily report" --to-file recipients.txt --user me@gmail.com
+"""
+import os
+import time
+import base64
+import getpass
+import smtplib
+import argparse
+import threading
+import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from email.utils import formataddr, make_msgid, getaddresses
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 465
+SMTP_SESSIONS = 4          # parallel logged-in sessions per batch
+SESSION_MESSAGES = 100     # messages per session before logging in again (Gmail's limit per connection)
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+GRAPH_BATCH = 20           # Graph's maximum sub-requests per $batch
+GRAPH_CONCURRENCY = 4      # Graph's limit on concurrent requests per mailbox
+GRAPH_RETRIES = 3          # rounds of retrying throttled sub-requests
+PAGE_SIZE = 100
+POOL_SIZE = 4
+TIMEOUT = 30
+REDIRECT_PORT = 8000
+AUTH_TIMEOUT = 300         # seconds to wait for the browser sign-in
+
+def message(sender, to, subject, body, html=None, sender_name=None, attachments=()):
+    """EmailMessage with a plain-text body, optional HTML alternative and (filename, bytes, mime type) attachments."""
+    msg = EmailMessage()
+    msg["From"] = formataddr((sender_name, sender)) if sender_name else sender
+    msg["To"] = to if isinstance(to, str) else ", ".join(to)
+    msg["Subject"] = subject
+    msg["Message-ID"] = make_msgid()
+    msg.set_content(body)
+    if html:
+        msg.add_alternative(html, subtype="html")
+    for name, data, mime in attachments:
+        maintype, subtype = mime.split("/", 1)
+        msg.add_attachment(data, maintype=maintype, subtype=subtype, filename=name)
+    return msg
+
+# ---------- SMTP ----------
+def _smtp_session(messages, user, password, host, port, ssl, starttls, timeout):
+    """Send `messages` over one logged-in session; returns {To: error}."""
+    failed, smtp, sent = {}, None, 0
+
+    def connect():
+        s = smtplib.SMTP_SSL(host, port, timeout=timeout) if ssl else smtplib.SMTP(host, port, timeout=timeout)
+        if starttls:
+            s.starttls()
+        if user:
+            s.login(user, password)
+        return s
+
+    try:
+        for msg in messages:
+            for attempt in (1, 2):
+                try:
+                    if smtp is None or sent >= SESSION_MESSAGES:
+                        if smtp is not None:
+                            smtp.quit()
+                        smtp, sent = connect(), 0
+                    refused = smtp.send_message(msg)
+                    sent += 1
+                    if refused:
+                        failed[msg["To"]] = f"refused: {', '.join(refused)}"
+                    break
+                except smtplib.SMTPServerDisconnected as e:
+                    smtp = None   # reconnect once, then give up on this message
+                    if attempt == 2:
+                        failed[msg["To"]] = repr(e)
+                except (smtplib.SMTPException, OSError) as e:
+                    if isinstance(e, smtplib.SMTPAuthenticationError):
+                        raise
+                    failed[msg["To"]] = repr(e)
+                    break
+    finally:
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except smtplib.SMTPException:
+                pass
+    return failed
+
+def send_smtp(messages, user, password, host=SMTP_HOST, port=SMTP_PORT, ssl=True, starttls=False,
+              sessions=SMTP_SESSIONS, timeout=TIMEOUT):
+    """Send EmailMessages over at most `sessions` persistent logins; returns {To: error} for failures."""
+    messages = list(messages)
+    sessions = max(1, min(sessions, len(messages)))
+    shares = [messages[i::sessions] for i in range(sessions)]
+    with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="smtp") as pool:
+        results = pool.map(lambda share: _smtp_session(share, user, password, host, port, ssl, starttls, timeout),
+                           shares)
+        return {to: err for failed in results for to, err in failed.items()}
+
+# ---------- Microsoft Graph ----------
+class GraphAuth:
+    """Delegated Graph token from a persisted MSAL cache: silent refresh, browser sign-in only as a fallback.
+
+    `make_app(token_cache)` (returning an MSAL-like client) and `open_browser`
+    can be swapped for stand-ins.
+    """
+    def __init__(self, client_id, authority, scopes, cache_path, client_secret=None,
+                 redirect_port=REDIRECT_PORT, open_browser=webbrowser.open, make_app=None):
+        import msal
+        self.scopes, self.cache_path = list(scopes), cache_path
+        self.redirect_port, self.open_browser = redirect_port, open_browser
+        self.cache = msal.SerializableTokenCache()
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                self.cache.deserialize(f.read())
+        if make_app is not None:
+            self.app = make_app(self.cache)
+        elif client_secret:
+            self.app = msal.ConfidentialClientApplication(client_id, authority=authority,
+                                                          client_credential=client_secret, token_cache=self.cache)
+        else:
+            self.app = msal.PublicClientApplication(client_id, authority=authority, token_cache=self.cache)
+        self._lock = threading.Lock()
+
+    def token(self):
+        """A valid access token; MSAL serves it from the cache or refreshes it without a prompt when it can."""
+        with self._lock:
+            result = None
+            for account in self.app.get_accounts():
+                result = self.app.acquire_token_silent(self.scopes, account=account)
+                if result:
+                    break
+            if not result:
+                result = self._sign_in()
+            self._save()
+        if "access_token" not in result:
+            raise RuntimeError(result.get("error_description", "Authentication failed"))
+        return result["access_token"]
+
+    def _sign_in(self):
+        flow = self.app.initiate_auth_code_flow(self.scopes, redirect_uri=f"http://localhost:{self.redirect_port}")
+        reply, received = {}, threading.Event()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = dict(parse_qsl(urlsplit(self.path).query))
+                if "code" not in params and "error" not in params:   # favicon and the like
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                reply.update(params)
+                received.set()
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b"Authentication finished. You can close this tab.")
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("localhost", self.redirect_port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            self.open_browser(flow["auth_uri"])
+            print("Please sign in via browser...")
+            if not received.wait(AUTH_TIMEOUT):
+                raise TimeoutError(f"No sign-in within {AUTH_TIMEOUT}s")
+        finally:
+            server.shutdown()
+            server.server_close()
+        return self.app.acquire_token_by_auth_code_flow(flow, reply)
+
+    def _save(self):
+        if not self.cache.has_state_changed:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        tmp = f"{self.cache_path}.tmp-{os.getpid()}"
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            f.write(self.cache.serialize())
+        os.replace(tmp, self.cache_path)
+        self.cache.has_state_changed = False
+
+def graph_message(msg):
+    """Graph JSON message resource for an EmailMessage (subject, body, recipients, attachments)."""
+    body = msg.get_body(("html", "plain"))
+    html = body is not None and body.get_content_subtype() == "html"
+    out = {
+        "subject": msg["Subject"] or "",
+        "body": {"contentType": "HTML" if html else "Text", "content": body.get_content() if body else ""},
+        "toRecipients": [{"emailAddress": {"address": a}} for _, a in getaddresses(msg.get_all("To", []))],
+    }
+    cc = getaddresses(msg.get_all("Cc", []))
+    if cc:
+        out["ccRecipients"] = [{"emailAddress": {"address": a}} for _, a in cc]
+    attachments = [{"@odata.type": "#microsoft.graph.fileAttachment", "name": part.get_filename(),
+                    "contentType": part.get_content_type(),
+                    "contentBytes": base64.b64encode(part.get_payload(decode=True)).decode()}
+                   for part in msg.iter_attachments()]
+    if attachments:
+        out["attachments"] = attachments
+    return out
+
+class GraphMail:
+    """Drafts and sends through Graph for the signed-in user; `token` is a string or a callable returning one."""
+    def __init__(self, token, base_url=GRAPH_URL, pool_size=POOL_SIZE, timeout=TIMEOUT):
+        self._token = token if callable(token) else (lambda: token)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        # resend only what Graph can't have processed: failed connects and 429/503. A read error
+        # or dropped response after the POST went out may mean a $batch was already sent.
+        retry = Retry(total=None, connect=2, read=0, other=0, status=2, backoff_factor=0.5,
+                      status_forcelist=(429, 503), allowed_methods=None, respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _request(self, method, url, **kwargs):
+        r = self.session.request(method, url, headers={"Authorization": f"Bearer {self._token()}"},
+                                 timeout=self.timeout, **kwargs)
+        r.raise_for_status()
+        return r
+
+    def drafts(self, select=("id", "subject", "toRecipients"), page_size=PAGE_SIZE):
+        """Every message in the Drafts folder, following @odata.nextLink page by page."""
+        url = f"{self.base_url}/me/mailFolders('Drafts')/messages"
+        params = {"$top": page_size, "$select": ",".join(select)}
+        while url:
+            js = self._request("GET", url, params=params).json()
+            yield from js.get("value", [])
+            url, params = js.get("@odata.nextLink"), None   # the link already carries the query
+
+    def batch(self, calls):
+        """Run [{"method", "url"[, "body"]}] (urls relative to the API root) through $batch.
+
+        Returns one {"status", "headers", "body"} per call, in order. Each
+        sub-request depends on the one GRAPH_CONCURRENCY places before it, so
+        a batch runs as that many sequential lanes. Throttled sub-requests are
+        resent after the longest Retry-After in the round, and so are the ones
+        that never ran because an earlier request in their lane failed (424).
+        Once the retries are used up, a lane stopped by throttling fails as a
+        whole with that throttled response instead of being resent.
+        """
+        out, pending, attempt = [None] * len(calls), list(range(len(calls))), 0
+        while pending:
+            retry, throttled, wait = [], False, 0.0
+            for k in range(0, len(pending), GRAPH_BATCH):
+                chunk = pending[k:k + GRAPH_BATCH]
+                reqs, after = [], {}
+                for j, i in enumerate(chunk):
+                    req = {"id": str(i), "method": calls[i]["method"], "url": calls[i]["url"]}
+                    if calls[i].get("body") is not None:
+                        req.update(body=calls[i]["body"], headers={"Content-Type": "application/json"})
+                    if j >= GRAPH_CONCURRENCY:
+                        after[i] = chunk[j - GRAPH_CONCURRENCY]
+                        req["dependsOn"] = [str(after[i])]
+                    reqs.append(req)
+                js = self._request("POST", f"{self.base_url}/$batch", json={"requests": reqs}).json()
+                responses = {int(r["id"]): r for r in js["responses"]}
+                for i, resp in responses.items():
+                    out[i] = resp
+                    if resp["status"] == 424:   # not run; the head of every lane always runs, so this ends
+                        cause = after[i]
+                        while responses[cause]["status"] == 424:
+                            cause = after[cause]
+                        if responses[cause]["status"] in (429, 503) and attempt >= GRAPH_RETRIES:
+                            out[i] = {**responses[cause], "id": str(i)}   # lane still throttled: fail it too
+                        else:
+                            retry.append(i)
+                    elif resp["status"] in (429, 503) and attempt < GRAPH_RETRIES:
+                        retry.append(i)
+                        throttled = True
+                        wait = max(wait, float((resp.get("headers") or {}).get("Retry-After", 1)))
+            if throttled:
+                attempt += 1
+                time.sleep(wait)
+            pending = sorted(retry)
+        return out
+
+    @staticmethod
+    def _errors(keys, responses):
+        return {key: f"{r['status']} {(r.get('body') or {}).get('error', {}).get('message', '')}".strip()
+                for key, r in zip(keys, responses) if not 200 <= r["status"] < 300}
+
+    def send_drafts(self, ids):
+        """Send existing drafts by id; returns {id: error} for the ones Graph rejected."""
+        ids = list(ids)
+        return self._errors(ids, self.batch([{"method": "POST", "url": f"/me/messages/{i}/send"} for i in ids]))
+
+    def send_mail(self, messages):
+        """Send EmailMessages without drafts (saved to Sent Items); returns {To: error}."""
+        messages = list(messages)
+        calls = [{"method": "POST", "url": "/me/sendMail", "body": {"message": graph_message(m)}} for m in messages]
+        return self._errors([m["To"] for m in messages], self.batch(calls))
+
+    def create_drafts(self, messages):
+        """Save EmailMessages as drafts; returns ([draft id or None per message], {To: error})."""
+        messages = list(messages)
+        responses = self.batch([{"method": "POST", "url": "/me/messages", "body": graph_message(m)} for m in messages])
+        ids = [(r.get("body") or {}).get("id") if 200 <= r["status"] < 300 else None for r in responses]
+        return ids, self._errors([m["To"] for m in messages], responses)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a report to a recipient list over one pooled SMTP batch.")
+    parser.add_argument("report", help="report body; .html files are sent as HTML with a plain-text note")
+    parser.add_argument("--subject", required=True)
+    parser.add_argument("--to-file", required=True, help="one address per line")
+    parser.add_argument("--user", required=True, help="SMTP login and From address")
+    parser.add_argument("--host", default=SMTP_HOST)
+    parser.add_argument("--port", type=int, default=SMTP_PORT)
+    parser.add_argument("--sessions", type=int, default=SMTP_SESSIONS)
+    parser.add_argument("--attach", nargs="*", default=[], help="files to attach")
+    args = parser.parse_args()
+
+    with open(args.report, encoding="utf-8") as f:
+        content = f.read()
+    html = content if args.report.endswith((".html", ".htm")) else None
+    text = "This report is best viewed in an HTML-capable mail client." if html else content
+    attachments = []
+    for path in args.attach:
+        with open(path, "rb") as f:
+            attachments.append((os.path.basename(path), f.read(), "application/octet-stream"))
+    with open(args.to_file) as f:
+        recipients = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    password = os.environ.get("MAIL_PASSWORD") or getpass.getpass("SMTP app password (will not be shown): ")
+
+    t = time.perf_counter()
+    failed = send_smtp([message(args.user, to, args.subject, text, html, attachments=attachments) for to in recipients],
+                       args.user, password, args.host, args.port, sessions=args.sessions)
+    for to, err in failed.items():
+        print(f"❌ {to}: {err}")
+    print(f"✅ Sent {len(recipients) - len(failed)}/{len(recipients)} in {time.perf_counter() - t:.1f}s")
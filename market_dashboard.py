@@ -1,202 +1,462 @@
-import os, pandas as pd, streamlit as st, plotly.express as px
+import os, pandas as pd, streamlit as st
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from fredapi import Fred
-import yfinance as yf, requests
-import difflib
-
-def fuzzy_match(name, options):
-    import difflib
-    if not isinstance(name, str): return None
-    options = list(options) if hasattr(options, "tolist") else list(options)
-    if not options: return None
-    name = name.strip().lower()
-    matches = difflib.get_close_matches(name, [str(x).lower() for x in options], n=1, cutoff=0.5)
-    if matches:
-        match_index = [str(x).lower() for x in options].index(matches[0])
-        return options[match_index]
-    return None
-    name = name.strip().lower()
-    matches = difflib.get_close_matches(name, [str(x).lower() for x in options], n=1, cutoff=0.5)
-    if matches:
-        match_index = [str(x).lower() for x in options].index(matches[0])
-        return options[match_index]
-    return None
-
+import cbonds_config
+import downsample
+import perf_log
+import snapshots
+# Section-specific modules (plotly, fredapi, requests via cbonds_client, pyarrow via
+# data_access/pulse_agg) are imported inside the sections and cached helpers that use them.
 
 st.set_page_config(page_title="MarketData Dashboard", layout="wide")
 st.markdown("<style>div.block-container{padding-top:1rem;padding-bottom:0.5rem;} .stMetric{gap:.25rem}</style>", unsafe_allow_html=True)
 st.title("📊 MarketData Dashboard")
+run = perf_log.Run("dashboard")
 
 DATA_DIR   = "/Users/Timur/Documents/PythonProjects/MarketData/data/processed"
 PULSE_DIR  = "/Users/Timur/Documents/PythonProjects/PropertyFinder/data/dubai_pulse/processed"
-PORTFOLIO_FILE = os.path.join(DATA_DIR, "portfolio.csv")
+PORTFOLIO_FILE = os.path.join(DATA_DIR, "portfolio.csv")   # legacy; imported into PORTFOLIO_DB once
+PORTFOLIO_DB = os.path.join(DATA_DIR, "portfolio.db")
+STORE_DIR  = os.path.join(DATA_DIR, "store")   # written by market_data_updater.py
+PULSE_AGG_DIR = os.path.join(DATA_DIR, "pulse_agg")
+ANALYTICS_DIR = os.path.join(DATA_DIR, "analytics")   # rolling equity metrics, see equity_analytics.py
+PERF_LOG   = perf_log.log_path(DATA_DIR)
+SERIES_CACHE = os.path.join(DATA_DIR, "cache", "series.sqlite")   # upstream answers shared by all workers
+SNAPSHOT_FILE = snapshots.manifest_path(DATA_DIR)   # published by market_data_updater.py --daemon
+SNAPSHOT_POLL = 30   # seconds between checks for a newer snapshot
+
+# Caches below are keyed on snapshot versions, so a new snapshot reloads only
+# the series that changed and everything else stays cached. While the daemon is
+# up the dashboard never calls upstream. Without it, gaps are topped up in the
+# background and published as a new version (stale-while-revalidate).
+snap = snapshots.read(SNAPSHOT_FILE)
+live = not snapshots.daemon_alive(snap)
 
-fred = Fred(api_key=st.secrets["general"]["FRED_API_KEY"])
+def publish_update(changed):
+    snapshots.publish(SNAPSHOT_FILE, "dashboard", changed)
 
 # ---------- helpers ----------
-@st.cache_data(show_spinner=False)
-def get_fred_series(series_id, years=5):
-    end = datetime.now(); start = end - timedelta(days=years*365)
-    s = fred.get_series(series_id, observation_start=start)
-    return pd.DataFrame({"Date": s.index, "Value": s.values}).dropna()
+@st.cache_resource(show_spinner=False)
+def fred_client():
+    from fredapi import Fred
+    return Fred(api_key=st.secrets["general"]["FRED_API_KEY"])
 
-@st.cache_data(show_spinner=False)
-def get_equity(symbol):
-    df = yf.download(symbol, period="5y", interval="1d", progress=False, auto_adjust=True)
-    if df.empty: return pd.DataFrame()
-    # flatten multiindex if present
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = [c[0] if isinstance(c, tuple) else c for c in df.columns]
-    df.reset_index(inplace=True)
-    if "Close" not in df.columns:
-        close_col = next((c for c in df.columns if "close" in c.lower()), None)
-        if not close_col: return pd.DataFrame()
-        df.rename(columns={close_col:"Close"}, inplace=True)
-    return df[["Date","Close"]].dropna()
-try:
-
-    merged["Spread"] = merged["Value_10Y"] - merged["Value_1M"]
-    c1,c2,c3 = st.columns([1,1,3])
-    with c1: st.metric("UST 10-Year", f"{d10.iloc[-1]['Value']:.2f}%", f"{d10.iloc[-1]['Value']-d10.iloc[-2]['Value']:+.02f}")
-    with c2: st.metric("UST 1-Month", f"{d1m.iloc[-1]['Value']:.2f}%", f"{d1m.iloc[-1]['Value']-d1m.iloc[-2]['Value']:+.02f}")
-    with c3:
-        fig = px.line(merged, x="Date", y=["Value_10Y","Value_1M"], labels={"value":"Yield (%)"}, title="UST 10Y vs 1M (5y)")
-        fig.update_layout(height=250, margin=dict(l=0,r=0,t=28,b=8), legend_title_text="")
-        st.plotly_chart(fig, use_container_width=True)
-    fig2 = px.area(merged, x="Date", y="Spread", title="UST 10Y − 1M Spread (5y)")
-    fig2.add_hline(y=0, line_color="red"); fig2.update_layout(height=260, margin=dict(l=0,r=0,t=28,b=8))
-    st.plotly_chart(fig2, use_container_width=True)
-except Exception as e:
-    st.error(f"UST failed: {e}")
-
-st.divider()
+# One upstream answer per series and TTL across replicas and restarts; see series_cache.py.
+@st.cache_resource(show_spinner=False)
+def get_series_cache():
+    import series_cache
+    return series_cache.SeriesCache(SERIES_CACHE)
+
+# Local store first; upstream only for the gap since the last stored date.
+# Keys include snapshot versions, so max_entries drops superseded versions.
+@st.cache_data(show_spinner=False, ttl=900, max_entries=256)
+def get_fred_series(series_id, years=5, version=0, live=True):
+    import data_access
+    perf_log.note_miss(f"fred:{series_id}")
+    start = datetime.now() - timedelta(days=years*365)
+    fetch = data_access.fred_fetcher(fred_client(), series_id) if live else None
+    df = data_access.load_series(STORE_DIR, series_id, start, fetch, on_update=publish_update,
+                                 cache=get_series_cache())
+    out = df.rename(columns={"date": "Date", "value": "Value"}).dropna()
+    out.attrs = df.attrs
+    return out
+
+# All configured symbols share one date × symbol close panel and one Yahoo call.
+@st.cache_data(show_spinner=False, ttl=900, max_entries=16)
+def get_equity_panel(symbols, years=5, versions=(), live=True):
+    import data_access
+    perf_log.note_miss("equity_panel")
+    start = datetime.now() - timedelta(days=years*365)
+    return data_access.load_panel(STORE_DIR, symbols, start, data_access.yahoo_batch if live else None,
+                                  on_update=publish_update, cache=get_series_cache())
+
+# Rolling metrics precomputed by the updater/daemon; the dashboard only reads them.
+@st.cache_data(show_spinner=False, ttl=900, max_entries=16)
+def get_equity_analytics(symbols, versions=()):
+    import equity_analytics as ea
+    perf_log.note_miss("equity_analytics")
+    return ea.load(ANALYTICS_DIR, symbols)
+
+def stale_note(*frames):
+    stale = [f.attrs.get("as_of") for f in frames if f.attrs.get("stale")]
+    if stale:
+        known = [d for d in stale if d is not None]   # None: nothing stored yet for that series
+        since = f" as of {min(known):%Y-%m-%d}" if known else ""
+        st.caption(f"⚠️ Upstream unavailable — showing stored data{since}")
+    elif any(f.attrs.get("refreshing") for f in frames):
+        st.caption("🔄 Newer data is loading in the background — it will appear on the next snapshot check")
+
+@st.cache_data(show_spinner=False, ttl=900, max_entries=16)
+def get_curve(years=5, versions=(), live=True):
+    import yield_curve
+    perf_log.note_miss("curve")
+    frames = {sid: get_fred_series(sid, years, v, live).rename(columns={"Date": "date", "Value": "value"})
+              for sid, v in versions}
+    return yield_curve.YieldCurve.from_frames(frames)
+
+# Charts are thinned to about one point per pixel of their column.
+HISTORY = {"1y": 1, "5y": 5, "10y": 10, "Max": 60}
+CHART_POINTS = {"full": 1200, "wide": 700, "third": 400}
+history = st.sidebar.radio("History", list(HISTORY), index=1, horizontal=True)
+years = HISTORY[history]
+run.meta["history"] = history
+
+def thin(df, x, ys, key, width):
+    return downsample.downsample_cached((key, history, snap["version"]), df, x, ys, CHART_POINTS[width])
+
+def chart(container, fig, sec):
+    """st.plotly_chart timed as the section's render stage."""
+    with sec.stage("render"):
+        container.plotly_chart(fig, use_container_width=True)
+
+@contextmanager
+def timed(name):
+    """Time a section as part of this page run, or as its own logged run when its fragment reruns alone."""
+    page = run
+    r = page or perf_log.Run("dashboard", fragment=name, history=history)
+    try:
+        with r.section(name) as sec:
+            yield sec
+    finally:
+        if page is None:
+            r.write(PERF_LOG)
+
+# Each section is a fragment: its own widgets rerun only that section, and a
+# full rerun only executes the sections picked in the sidebar.
+
+# ========== UST ==========
+@st.fragment
+def ust_section():
+    import plotly.express as px
+    import yield_curve
+    st.header("🇺🇸 US Treasury Yields")
+    with timed("ust") as sec:
+        try:
+            with sec.stage("fetch"):
+                versions = snapshots.versions(snap, yield_curve.TENORS)
+                d10 = sec.count(get_fred_series("DGS10", years, dict(versions)["DGS10"], live))
+                d1m = sec.count(get_fred_series("DGS1MO", years, dict(versions)["DGS1MO"], live))
+                curve = get_curve(years, versions, live)
+                sec.count(curve.Y)
+            stale_note(d10, d1m)
+            as_of = curve.dates[-1]
+            c1,c2,c3 = st.columns([1,1,3])
+            for col, name, df in [(c1, "UST 10-Year", d10), (c2, "UST 1-Month", d1m)]:
+                if len(df) < 2:
+                    col.warning(f"{name} unavailable")
+                    continue
+                col.metric(name, f"{df.iloc[-1]['Value']:.2f}%", f"{df.iloc[-1]['Value']-df.iloc[-2]['Value']:+.02f}")
+            with c3:
+                shown = [sid for sid in ("DGS10", "DGS1MO") if sid in curve.series_ids]
+                if shown:
+                    ys = [yield_curve.LABELS[sid] for sid in shown]
+                    lines = thin(curve.tenor_frame(*shown), "Date", ys, ("UST 10Y/1M", as_of), "wide")
+                    fig = px.line(lines, x="Date", y=ys, labels={"value":"Yield (%)"}, title=f"UST 10Y vs 1M ({history})")
+                    fig.update_layout(height=250, margin=dict(l=0,r=0,t=28,b=8), legend_title_text="")
+                    chart(st, fig, sec)
+
+            c1,c2 = st.columns([2,3])
+            with c1:
+                snaps = pd.DataFrame({f"{d:%Y-%m-%d}": curve.snapshot(d)
+                                      for d in [curve.dates[-1], curve.dates[-1] - pd.DateOffset(years=1)]})
+                snaps["Maturity"] = curve.maturities
+                fig = px.line(snaps, x="Maturity", y=snaps.columns[:-1], markers=True, log_x=True,
+                              labels={"value":"Yield (%)","Maturity":"Maturity (years)"}, title="Curve: today vs 1y ago")
+                fig.update_layout(height=260, margin=dict(l=0,r=0,t=28,b=8), legend_title_text="")
+                chart(st, fig, sec)
+            with c2:
+                labels = curve.spread_labels
+                if labels:
+                    spreads = curve.spread_frame()
+                    pair = st.selectbox("Spread", labels, index=labels.index("10Y−1M") if "10Y−1M" in labels else 0)
+                    spread = thin(spreads[pair].rename("Spread").rename_axis("Date").reset_index(), "Date", "Spread", (pair, as_of), "wide")
+                    fig2 = px.area(spread, x="Date", y="Spread", title=f"UST {pair} Spread ({history})")
+                    fig2.add_hline(y=0, line_color="red"); fig2.update_layout(height=260, margin=dict(l=0,r=0,t=28,b=8))
+                    chart(st, fig2, sec)
+
+            shape, pct = curve.shape().iloc[-1], curve.percentiles()
+            cols = st.columns(3)
+            for col, name in zip(cols, ["Level", "Slope", "Curvature"]):
+                if pd.isna(shape[name]):   # a tenor it needs isn't loaded
+                    col.metric(f"Curve {name}", "—")
+                    continue
+                col.metric(f"Curve {name}", f"{shape[name]:+.2f}", f"{pct[name]:.0f}th pct ({history})", delta_color="off")
+        except Exception as e:
+            sec.error = repr(e)
+            st.error(f"UST failed: {e}")
 
 # ========== Equities ==========
-st.header("📈 Equity Indexes (live)")
-symbols={"S&P 500":"^GSPC","NASDAQ":"^IXIC","DJIA":"^DJI"}
-top = st.columns(3)
-for (name,sym), col in zip(symbols.items(), top):
-    df=get_equity(sym)
-    if df.empty: 
-        col.warning(f"{name} unavailable"); 
-        continue
-    last, prev = float(df["Close"].iloc[-1]), float(df["Close"].iloc[-2])
-    col.metric(name, f"{last:,.0f}", f"{(last/prev-1)*100:+.2f}%")
-row = st.columns(3)
-for (name,sym), col in zip(symbols.items(), row):
-    df=get_equity(sym)
-    if df.empty: continue
-    fig=px.line(df, x="Date", y="Close", title=f"{name} — 5y")
-    fig.update_layout(height=240, margin=dict(l=0,r=0,t=32,b=18))
-    col.plotly_chart(fig, use_container_width=True)
-
-st.divider()
+@st.fragment
+def equities_section():
+    import plotly.express as px
+    st.header("📈 Equity Indexes (live)")
+    with timed("equities") as sec:
+        symbols={"S&P 500":"^GSPC","NASDAQ":"^IXIC","DJIA":"^DJI"}
+        versions = snapshots.versions(snap, symbols.values())
+        with sec.stage("fetch"):
+            panel = sec.count(get_equity_panel(tuple(symbols.values()), years, versions, live))
+        closes = {sym: panel[sym].dropna().rename("Close").reset_index() if sym in panel else pd.DataFrame() for sym in symbols.values()}
+        top = st.columns(len(symbols))
+        for (name,sym), col in zip(symbols.items(), top):
+            df=closes[sym]
+            if len(df) < 2:
+                col.warning(f"{name} unavailable")
+                continue
+            last, prev = float(df["Close"].iloc[-1]), float(df["Close"].iloc[-2])
+            col.metric(name, f"{last:,.0f}", f"{(last/prev-1)*100:+.2f}%")
+        stale_note(panel)
+        row = st.columns(len(symbols))
+        for (name,sym), col in zip(symbols.items(), row):
+            df=closes[sym]
+            if df.empty: continue
+            df=thin(df, "Date", "Close", (sym, panel.attrs.get("as_of")), "third")
+            fig=px.line(df, x="Date", y="Close", title=f"{name} — {history}")
+            fig.update_layout(height=240, margin=dict(l=0,r=0,t=32,b=18))
+            chart(col, fig, sec)
+
+        with sec.stage("fetch"):
+            stats, corr = get_equity_analytics(tuple(symbols.values()),
+                                               snapshots.versions(snap, [f"analytics:{s}" for s in symbols.values()]))
+        if stats.isna().all(axis=None):
+            st.info("No rolling analytics yet — they are computed by the updater (`python market_data_updater.py`).")
+            return
+        names = {sym: name for name, sym in symbols.items()}
+        c1, c2 = st.columns([3,2])
+        with c1:
+            table = stats.rename(index=names) * 100
+            table.columns = [c.replace("ret_", "Return ").replace("vol_", "Vol ").replace("max_drawdown", "Max DD")
+                             .replace("drawdown", "Drawdown") for c in table.columns]
+            st.dataframe(table, use_container_width=True,
+                         column_config={c: st.column_config.NumberColumn(c, format="%+.1f%%") for c in table.columns})
+        with c2:
+            window = st.radio("Correlation window", list(corr), horizontal=True)
+            cm = corr[window].rename(index=names, columns=names)
+            fig = px.imshow(cm, text_auto=".2f", zmin=-1, zmax=1, color_continuous_scale="RdBu",
+                            title=f"Daily return correlation ({window})")
+            fig.update_layout(height=260, margin=dict(l=0,r=0,t=32,b=8), coloraxis_showscale=False)
+            chart(st, fig, sec)
 
 # ========== Sukuk (Cbonds API with secrets) ==========
-st.header("🕌 Sukuk Bonds (Cbonds Live API)")
 
-cb_user = st.secrets["cbonds"]["login"]
-cb_pass = st.secrets["cbonds"]["password"]
+@st.cache_resource(show_spinner=False)
+def cbonds():
+    import cbonds_client
+    cfg = st.secrets["cbonds"]
+    return cbonds_client.CbondsClient(cfg["login"], cfg["password"], cfg.get("base_url", cbonds_client.API_BASE))
 
-isins = ["XS0975256683","XS2595679111","XS1809986734","XS2396609819","XS2506541443","XS2069132036"]
-rows = []
-for isin in isins:
-    url = "https://ws.cbonds.info/services/json/?method=get_emissions/"
-    params = {"login": cb_user, "password": cb_pass, "ISIN": isin}
-    try:
-        r = requests.get(url, params=params, timeout=20)
-        if r.status_code == 200:
-            js = r.json()
-            items = js.get("items") or []
-            match = next((e for e in items if e.get("isin") == isin), None)
-            if match:
-                rows.append({
-                    "ISIN": isin,
-                    "Issuer": match.get("issuer_name_eng", ""),
-                    "Coupon": match.get("coupon", ""),
-                    "Maturity": match.get("maturity_date", ""),
-                    "Currency": match.get("currency_name", "")
+# Shared across sessions; a widget click never re-hits Cbonds within the TTL.
+# Once the daemon has published a harvested emissions snapshot, that is read instead of the API;
+# ISINs the snapshot doesn't cover yet are still looked up live. If any live lookup fails this
+# raises LookupFailed (with the rows that did come back), so a failed answer is never cached
+# and the next run asks again.
+@st.cache_data(show_spinner="Loading Cbonds…", ttl=6*3600)
+def get_sukuk(isins, version=0):
+    import cbonds_client
+    perf_log.note_miss("sukuk")
+    found, errors = {}, {}
+    if version:
+        import cbonds_harvester
+        df = cbonds_harvester.load(os.path.join(DATA_DIR, "cbonds"), "emissions")
+        df = df[df["isin"].isin(isins)].astype(object)
+        found = {r["isin"]: r for r in df.where(df.notna(), None).to_dict("records")}
+    missing = [i for i in isins if i not in found]
+    if missing:
+        live, errors = cbonds().emissions(missing)
+        found.update(live)
+    rows = [cbonds_client.emission_row(i, found[i]) for i in isins if i in found]
+    if errors:
+        raise cbonds_client.LookupFailed(rows, errors)
+    return rows
+
+# Yields / durations are computed by the updater (bond_analytics.py) after each Cbonds harvest.
+@st.cache_data(show_spinner=False)
+def get_bond_analytics(isins, versions=()):
+    import bond_analytics
+    perf_log.note_miss("bond_analytics")
+    cbonds_dir = os.path.join(DATA_DIR, "cbonds")
+    return bond_analytics.latest(cbonds_dir, isins), bond_analytics.history(cbonds_dir, isins, "ytm")
+
+BOND_COLUMNS = {"date": "As of", "price": "Price", "ytm": "YTM", "mod_duration": "Mod. duration",
+                "convexity": "Convexity", "accrued": "Accrued"}
+
+@st.fragment
+def sukuk_section():
+    st.header("🕌 Sukuk Bonds (Cbonds Live API)")
+    isins = tuple(cbonds_config.SUKUK_ISINS)   # the same watchlist the updater daemon harvests
+    import cbonds_client
+    with timed("sukuk") as sec:
+        try:
+            with sec.stage("fetch"):
+                try:
+                    rows, errors = get_sukuk(isins, snap["series"].get("cbonds:emissions", 0)), {}
+                except cbonds_client.LookupFailed as e:
+                    rows, errors = e.rows, e.errors
+                sec.count(rows)
+            for isin, err in errors.items():
+                st.warning(f"{isin}: {err}")
+        except Exception as e:
+            rows = []
+            sec.error = repr(e)
+            st.error(f"Cbonds failed: {e}")
+
+        if rows:
+            with sec.stage("fetch"):
+                latest, ytm = get_bond_analytics(isins, snapshots.versions(snap, [f"bonds:{i}" for i in isins]))
+            table = pd.DataFrame(rows)
+            if not latest.empty:
+                table = table.join(latest[list(BOND_COLUMNS)].rename(columns=BOND_COLUMNS), on="ISIN")
+                table["YTM"] *= 100
+            with sec.stage("render"):
+                st.dataframe(table, use_container_width=True, hide_index=True, column_config={
+                    "As of": st.column_config.DateColumn("As of"),
+                    "Price": st.column_config.NumberColumn("Price", format="%.3f"),
+                    "YTM": st.column_config.NumberColumn("YTM", format="%.2f%%"),
+                    "Mod. duration": st.column_config.NumberColumn("Mod. duration", format="%.2f"),
+                    "Convexity": st.column_config.NumberColumn("Convexity", format="%.1f"),
+                    "Accrued": st.column_config.NumberColumn("Accrued", format="%,.2f"),
                 })
+            if not ytm.empty:
+                import plotly.express as px
+                fig = px.line(ytm * 100, labels={"value": "YTM, %", "date": "", "isin": "ISIN"},
+                              title="Yield to maturity")
+                fig.update_layout(height=300, margin=dict(l=0,r=0,t=32,b=18))
+                chart(st, fig, sec)
         else:
-            st.warning(f"{isin}: HTTP {r.status_code}")
-    except Exception as e:
-        st.error(f"{isin}: {e}")
+            st.info("No Sukuk data retrieved — check credentials or ISIN list.")
 
-if rows:
-    st.dataframe(pd.DataFrame(rows), use_container_width=True)
-else:
-    st.info("No Sukuk data retrieved — check credentials or ISIN list.")
+# ---------- Real Estate Portfolio ----------
+MARKET_WINDOWS = {"All time": None, "Last 12 months": 12, "Last 3 months": 3}
 
-st.divider()
+@st.cache_data(show_spinner=False)
+def get_area_stats(pulse_file, mtime, months=None):
+    import pulse_agg
+    perf_log.note_miss("area_stats")
+    # mtime is part of the cache key; the on-disk digests are keyed the same way
+    return pulse_agg.area_stats(pulse_file, PULSE_AGG_DIR, months=months)
 
-# ---------- Real Estate Portfolio ----------
-st.header("🏘️ Property Portfolio vs Market")
-
-pulse_file = newest_parquet(PULSE_DIR)
-if pulse_file and os.path.exists(pulse_file):
-    pulse = pd.read_parquet(pulse_file)
-    area_col = "area_name_en" if "area_name_en" in pulse.columns else None
-    price_col = "meter_sale_price"
-
-    pulse = pulse.dropna(subset=[area_col, price_col])
-    pulse = pulse[pulse[area_col].astype(str).str.strip() != ""]
-
-    pulse["price_psm"] = pulse[price_col]
-    pulse["price_psf"] = pulse[price_col] / 10.7639
-    area_mean_m2 = pulse.groupby(area_col)["price_psm"].mean().dropna()
-    area_mean_ft2 = pulse.groupby(area_col)["price_psf"].mean().dropna()
-
-    portfolio = (
-        pd.read_csv(PORTFOLIO_FILE)
-        if os.path.exists(PORTFOLIO_FILE)
-        else pd.DataFrame(columns=["Location", "Price", "Area_ft2"])
-    )
-
-    with st.form("add_property"):
-        st.subheader("Add New Property")
-        c1, c2, c3 = st.columns(3)
-        with c1:
-            location = st.selectbox("Location", sorted(area_mean_m2.index))
-        with c2:
-            price = st.number_input("Purchase Price (AED)", min_value=0.0, step=10000.0)
-        with c3:
-            area_ft2 = st.number_input("Unit Area (ft²)", min_value=0.0, step=10.0)
-        if st.form_submit_button("Add / Update") and location and price > 0 and area_ft2 > 0:
-            portfolio = pd.concat(
-                [portfolio, pd.DataFrame({"Location":[location],"Price":[price],"Area_ft2":[area_ft2]})],
-                ignore_index=True,
-            )
-            os.makedirs(os.path.dirname(PORTFOLIO_FILE), exist_ok=True)
-            portfolio.to_csv(PORTFOLIO_FILE, index=False)
-            st.success("Property added."); st.experimental_rerun()
-
-    if not portfolio.empty:
-        portfolio["Area_m2"] = portfolio["Area_ft2"] / 10.7639
-        portfolio["Your_PPSM"] = portfolio["Price"] / portfolio["Area_m2"]
-        portfolio["Matched_Location"] = portfolio["Location"].apply(lambda x: fuzzy_match(x, area_mean_m2.index))
-        portfolio["Market_PPSM"] = portfolio["Matched_Location"].map(area_mean_m2)
-        portfolio["Change_%"] = (portfolio["Market_PPSM"] / portfolio["Your_PPSM"] - 1) * 100
-        portfolio["Your_PPSF"] = portfolio["Your_PPSM"] / 10.7639
-        portfolio["Market_PPSF"] = portfolio["Market_PPSM"] / 10.7639
-
-        st.subheader("Your Portfolio (compared on AED / m² basis)")
-        for i, row in portfolio.iterrows():
-            c1, c2, c3, c4, c5, c6 = st.columns([2,2,2,2,2,1])
-            c1.text(row["Location"])
-            c2.text(f"AED {row['Price']:,.0f}")
-            c3.text(f"{row['Area_ft2']:,.0f} ft²  ({row['Area_m2']:.1f} m²)")
-            c4.text(f"Your {row['Your_PPSF']:,.0f} / ft²")
-            c5.text(f"{row['Change_%']:+.2f}% vs market")
-            if c6.button("🗑️", key=f"del_{i}"):
-                portfolio = portfolio.drop(i).reset_index(drop=True)
-                portfolio.to_csv(PORTFOLIO_FILE, index=False)
-                st.experimental_rerun()
-
-        avg = portfolio["Change_%"].mean()
-        st.metric("Portfolio Avg Δ (AED / m²)", f"{avg:+.2f}%")
-    else:
-        st.info("Add a property above to see portfolio performance.")
-else:
-    st.warning("No Dubai Pulse file found in processed folder.")
-
-st.caption("© 2025 MarketData | Sources: FRED · Yahoo · Cbonds (demo) · Dubai Pulse")
\ No newline at end of file
+@st.cache_resource(show_spinner=False)
+def get_matcher(pulse_file, mtime):
+    import area_matcher, pulse_agg
+    perf_log.note_miss("matcher")
+    areas = get_area_stats(pulse_file, mtime).index
+    return area_matcher.AreaMatcher(areas, aliases=pulse_agg.project_areas(pulse_file, PULSE_AGG_DIR))
+
+@st.cache_resource(show_spinner=False)
+def get_portfolio_store():
+    import portfolio_store
+    return portfolio_store.PortfolioStore(PORTFOLIO_DB, legacy_csv=PORTFOLIO_FILE)
+
+@st.fragment
+def property_section():
+    import pulse_agg, portfolio_store
+    st.header("🏘️ Property Portfolio vs Market")
+    with timed("property") as sec:
+        pulse_file = pulse_agg.newest_parquet(PULSE_DIR)
+        if pulse_file and os.path.exists(pulse_file):
+            window = st.radio("Market window", list(MARKET_WINDOWS), horizontal=True, key="market_window")
+            with sec.stage("fetch"):
+                area_stats = sec.count(get_area_stats(pulse_file, os.path.getmtime(pulse_file)))
+                area_mean_m2 = area_stats["mean_psm"].dropna()
+                if MARKET_WINDOWS[window]:
+                    # areas without trades in the window keep their all-time price
+                    recent = get_area_stats(pulse_file, os.path.getmtime(pulse_file), MARKET_WINDOWS[window])
+                    area_mean_m2 = recent["mean_psm"].dropna().combine_first(area_mean_m2)
+                matcher = get_matcher(pulse_file, os.path.getmtime(pulse_file))
+                store = get_portfolio_store()
+
+            with st.form("add_property", clear_on_submit=True):
+                st.subheader("Add New Property")
+                c1, c2, c3 = st.columns(3)
+                with c1:
+                    location = st.selectbox("Location", sorted(area_mean_m2.index))
+                with c2:
+                    price = st.number_input("Purchase Price (AED)", min_value=0.0, step=10000.0)
+                with c3:
+                    area_ft2 = st.number_input("Unit Area (ft²)", min_value=0.0, step=10.0)
+                if st.form_submit_button("Add / Update") and location and price > 0 and area_ft2 > 0:
+                    store.add(location, price, area_ft2)
+                    st.success("Property added.")
+
+            portfolio = sec.count(store.holdings())
+            if not portfolio.empty:
+                portfolio = portfolio_store.valuation(portfolio, area_mean_m2, matcher)
+
+                st.subheader("Your Portfolio (compared on AED / m² basis)")
+                view = portfolio[["id","Location","Price","Area_ft2","Area_m2","Your_PPSF","Market_PPSF","Change_%"]].copy()
+                view.insert(0, "Delete", False)
+                with sec.stage("render"):
+                    edited = st.data_editor(
+                        view, key="portfolio_table", hide_index=True, use_container_width=True,
+                        disabled=[c for c in view.columns if c != "Delete"],
+                        column_config={
+                            "id": None,
+                            "Price": st.column_config.NumberColumn("Price (AED)", format="%,.0f"),
+                            "Area_ft2": st.column_config.NumberColumn("Area (ft²)", format="%,.0f"),
+                            "Area_m2": st.column_config.NumberColumn("Area (m²)", format="%.1f"),
+                            "Your_PPSF": st.column_config.NumberColumn("Your / ft²", format="%,.0f"),
+                            "Market_PPSF": st.column_config.NumberColumn("Market / ft²", format="%,.0f"),
+                            "Change_%": st.column_config.NumberColumn("Δ vs market", format="%+.2f%%"),
+                        },
+                    )
+                selected = edited.loc[edited["Delete"], "id"].tolist()
+                c1, c2, c3 = st.columns([1,1,3])
+                if c1.button(f"🗑️ Delete selected ({len(selected)})", disabled=not selected):
+                    store.delete(selected)
+                    st.rerun(scope="fragment")
+                c2.download_button("Export CSV", store.export_csv(), file_name="portfolio.csv", mime="text/csv")
+
+                avg = portfolio["Change_%"].mean()
+                st.metric("Portfolio Avg Δ (AED / m²)", f"{avg:+.2f}%")
+            else:
+                st.info("Add a property above to see portfolio performance.")
+
+            # the confirmation is kept in session state so it survives the fragment rerun below
+            notice = st.session_state.pop("portfolio_import_notice", None)
+            with st.expander("Import holdings from CSV", expanded=notice is not None):
+                if notice:
+                    st.success(notice)
+                upload = st.file_uploader("CSV with Location, Price, Area_ft2 columns", type="csv")
+                if upload is not None and st.button("Import"):
+                    st.session_state["portfolio_import_notice"] = f"Imported {store.import_csv(upload)} holdings."
+                    st.rerun(scope="fragment")
+        else:
+            st.warning("No Dubai Pulse file found in processed folder.")
+
+# ---------- Page ----------
+SECTIONS = {"UST": ust_section, "Equities": equities_section, "Sukuk": sukuk_section, "Property": property_section}
+shown = st.sidebar.multiselect("Sections", list(SECTIONS), default=list(SECTIONS))
+run.meta["sections"] = shown
+
+@st.fragment(run_every=SNAPSHOT_POLL)
+def snapshot_watch():
+    """Poll the manifest; a newer version reruns the page, which reloads only the changed series."""
+    latest = snapshots.read(SNAPSHOT_FILE)
+    if latest["version"] != snap["version"]:
+        st.rerun()
+    source = "daemon" if not live else "live top-ups (daemon not running)"
+    st.caption(f"📦 Snapshot v{snap['version']} · {source}")
+
+with st.sidebar:
+    snapshot_watch()
+
+# Diagnostics: per-section timings for this rerun; profiling is opt-in, one rerun at a time.
+diagnostics = st.sidebar.toggle("⏱️ Diagnostics")
+profile = perf_log.Profile() if diagnostics and st.sidebar.button("Profile this rerun") else None
+
+for i, name in enumerate(shown):
+    if i:
+        st.divider()
+    SECTIONS[name]()
+
+st.caption("© 2025 MarketData | Sources: FRED · Yahoo · Cbonds (demo) · Dubai Pulse")
+
+# ---------- Diagnostics ----------
+profile_text = profile.stop(os.path.join(os.path.dirname(PERF_LOG), f"profile-{run.id}.prof")) if profile else None
+run.write(PERF_LOG)
+if diagnostics:
+    with st.expander(f"⏱️ Diagnostics — rerun {run.seconds:.2f}s", expanded=True):
+        st.dataframe(run.frame(), use_container_width=True, hide_index=True)
+        st.caption(f"Logged to {PERF_LOG} · `python perf_log.py` summarizes recent runs")
+        if profile_text:
+            st.code(profile_text, language=None)
+run = None   # fragment reruns after this point log as their own runs (see timed())
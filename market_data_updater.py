@@ -1,13 +1,27 @@
 #!/usr/bin/env python3
 import os
+import time
+import signal
+import socket
+import argparse
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import partial
 from fredapi import Fred
-import yfinance as yf
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+import ts_store
+import data_access
+import perf_log
+import snapshots
+import equity_analytics
 
 # ======== CONFIG ========
 BASE_DIR = os.path.expanduser("~/Documents/PythonProjects/MarketData")
 DATA_DIR = os.path.join(BASE_DIR, "data/processed")
+STORE_DIR = os.path.join(DATA_DIR, "store")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # FRED API key (set once: export FRED_API_KEY="your_key")
@@ -17,54 +31,362 @@ if not FRED_API_KEY or len(FRED_API_KEY) != 32:
     raise ValueError("❌ Invalid or missing FRED API key. Set it using: export FRED_API_KEY=your_32char_key")
 
 fred = Fred(api_key=FRED_API_KEY)
+# fredapi calls urlopen() without a timeout; a stalled socket would otherwise hold a worker forever
+SOCKET_TIMEOUT = 30
+socket.setdefaulttimeout(SOCKET_TIMEOUT)
 
 UST_SERIES = ["DGS1MO","DGS3MO","DGS6MO","DGS1","DGS2","DGS5","DGS7","DGS10","DGS20","DGS30"]
 INDEX_SERIES = {"SP500": "SP500", "NASDAQ": "NASDAQCOM", "DJIA": "DJIA"}
 
-def fetch_fred_series(series_id):
-    """Fetch a single FRED series safely."""
+# Incremental sync re-requests this many days before the last stored date so
+# late FRED revisions overwrite what we already have.
+LOOKBACK_DAYS = 7
+
+YAHOO_SYMBOLS = {"^GSPC": "SP500", "^IXIC": "NASDAQ", "^DJI": "DJIA"}
+
+# ======== SCHEDULER ========
+# Max simultaneous requests per upstream (Cbonds throttles at 30 req/min).
+SOURCE_LIMITS = {"fred": 4, "yahoo": 2, "cbonds": 2}
+MAX_RETRIES = 3        # retries after the first attempt
+BACKOFF_BASE = 1.0     # seconds; doubles on each retry
+JOB_TIMEOUT = 60       # seconds per attempt
+COORDINATORS = 32      # jobs waiting on their source at once (they only wait, never fetch)
+HARVEST_TIMEOUT = 2 * 3600   # the Cbonds harvest is rate limited to 30 requests/minute per endpoint
+
+Job = namedtuple("Job", ["name", "source", "fn", "timeout"], defaults=[None])   # timeout: None → run_jobs' default
+JobResult = namedtuple("JobResult", ["name", "source", "ok", "value", "error", "attempts", "seconds"])
+
+def _attempt(pool, fn, timeout):
+    """Run fn() on the source's pool; raise TimeoutError if it hasn't returned within `timeout`.
+
+    One deadline covers queueing and running, so hung calls filling the pool
+    can't block later attempts. A call that timed out in the queue is
+    cancelled. One that timed out while running keeps its worker until it
+    really returns, so a source never has more than its limit of calls in
+    flight, abandoned ones included.
+    """
+    fut = pool.submit(fn)
     try:
-        data = fred.get_series(series_id)
-    except Exception as e:
-        print(f"[ERROR] FRED request failed for {series_id}: {e}")
-        return pd.DataFrame(columns=["date","value","series"])
+        return fut.result(timeout=timeout)
+    except FutureTimeout:
+        where = "waiting for a free worker" if fut.cancel() else "running"
+        raise TimeoutError(f"no response after {timeout}s ({where})") from None
+
+def _run_job(job, pools, retries, timeout, backoff):
+    started = time.perf_counter()
+    error = None
+    for attempt in range(1, retries + 2):
+        try:
+            value = _attempt(pools[job.source], job.fn, job.timeout or timeout)
+            return JobResult(job.name, job.source, True, value, None, attempt, time.perf_counter() - started)
+        except Exception as e:
+            error = e
+            if attempt <= retries:
+                time.sleep(backoff * 2 ** (attempt - 1))   # holds no worker of the source
+    print(f"[ERROR] {job.name} failed after {retries + 1} attempts: {error}")
+    return JobResult(job.name, job.source, False, None, error, retries + 1, time.perf_counter() - started)
+
+def run_jobs(jobs, limits=None, retries=MAX_RETRIES, timeout=JOB_TIMEOUT, backoff=BACKOFF_BASE):
+    """Run jobs concurrently, capped per source, and return {job name: JobResult}.
+
+    Each source gets its own pool sized to its limit; the attempts run there.
+    Jobs are coordinated (timeouts, backoff sleeps) from a separate pool.
+    """
+    limits = {**SOURCE_LIMITS, **(limits or {})}
+    pools = {src: ThreadPoolExecutor(max_workers=limits.get(src, 1), thread_name_prefix=src)
+             for src in {j.source for j in jobs}}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(len(jobs), COORDINATORS))) as pool:
+            futures = [pool.submit(_run_job, j, pools, retries, timeout, backoff) for j in jobs]
+            return {f.result().name: f.result() for f in futures}
+    finally:
+        for p in pools.values():
+            p.shutdown(wait=False)   # don't block on calls that already timed out
+
+def print_summary(results, wall):
+    """Print per-job timings and payload sizes plus total wall time vs. the serial sum."""
+    print(f"\n{'job':<24}{'source':<8}{'status':<8}{'tries':>6}{'secs':>9}{'rows':>9}{'KB':>9}")
+    for r in sorted(results.values(), key=lambda r: -r.seconds):
+        rows, nbytes = perf_log.size_of(r.value)
+        print(f"{r.name:<24}{r.source:<8}{'ok' if r.ok else 'FAILED':<8}{r.attempts:>6}{r.seconds:>9.2f}"
+              f"{rows:>9}{nbytes / 1024:>9.1f}")
+    serial = sum(r.seconds for r in results.values())
+    print(f"{len(results)} jobs in {wall:.2f}s wall ({serial:.2f}s if run serially)")
+
+def get_fred_frame(series_id, start=None):
+    """Fetch a FRED series as a long-format frame; errors propagate to the caller."""
+    data = fred.get_series(series_id, observation_start=start) if start else fred.get_series(series_id)
     df = pd.DataFrame(data, columns=["value"])
     df.index.name = "date"
     df.reset_index(inplace=True)
     df["series"] = series_id
     return df
 
-def fetch_ust():
-    dfs = [fetch_fred_series(s) for s in UST_SERIES]
-    ust_df = pd.concat(dfs, ignore_index=True)
-    file = os.path.join(DATA_DIR, "ust_yields.csv")
-    ust_df.to_csv(file, index=False)
-    print(f"[UST] Saved {len(ust_df)} rows → {file}")
+def sync_start(series_id, full=False):
+    """First date to request for `series_id`, or None for a full fetch."""
+    last = None if full else ts_store.last_date(STORE_DIR, series_id)
+    if last is None:
+        return None
+    return (last - timedelta(days=LOOKBACK_DAYS)).date()
 
-def fetch_indices():
+def migrate_csvs():
+    """Seed the Parquet store from the legacy processed CSVs (first run only)."""
+    legacy = [("ust_yields.csv", "value", UST_SERIES)]
+    legacy += [(f"{name.lower()}.csv", "close", [code]) for name, code in INDEX_SERIES.items()]
+    for fname, value_col, series in legacy:
+        file = os.path.join(DATA_DIR, fname)
+        if os.path.exists(file) and not all(s in ts_store.list_series(STORE_DIR) for s in series):
+            n = ts_store.import_csv(STORE_DIR, file, value_col)
+            print(f"[STORE] Imported {n} rows from {file}")
+
+def save_series(label, series_id, df):
+    n = ts_store.write_series(STORE_DIR, series_id, df)
+    print(f"[{label}] Synced {n} new/revised rows ({len(df)} fetched) → {series_id}")
+    return n
+
+def fred_jobs(series_ids, full=False):
+    return [Job(f"fred:{s}", "fred", partial(get_fred_frame, s, sync_start(s, full))) for s in series_ids]
+
+def save_fred(results, series_ids, label=None):
+    """Store successful FRED results; returns {series_id: rows changed}."""
+    changed = {}
+    for s in series_ids:
+        r = results[f"fred:{s}"]
+        if r.ok:
+            changed[s] = save_series(label or s, s, r.value)
+    return changed
+
+def save_indices(results):
+    changed = {}
     for name, code in INDEX_SERIES.items():
-        df = fetch_fred_series(code)
-        df.rename(columns={"value": "close"}, inplace=True)
-        file = os.path.join(DATA_DIR, f"{name.lower()}.csv")
-        df.to_csv(file, index=False)
-        print(f"[{name}] Saved {len(df)} rows → {file}")
-
-def fetch_yahoo(symbol, name):
-    ticker = yf.Ticker(symbol)
-    df = ticker.history(period="max")[["Close"]].reset_index()
-    df.columns = ["date", "close"]
-    file = os.path.join(DATA_DIR, f"{name.lower()}_yahoo.csv")
-    df.to_csv(file, index=False)
-    print(f"[Yahoo {name}] Saved {len(df)} rows → {file}")
-
-def update_all():
-    fetch_ust()
-    fetch_indices()
-    # Uncomment for fresher Yahoo data
-    # fetch_yahoo("^GSPC", "SP500")
-    # fetch_yahoo("^IXIC", "NASDAQ")
-    # fetch_yahoo("^DJI", "DJIA")
+        changed.update(save_fred(results, [code], name))
+    return changed
 
-if __name__ == "__main__":
-    update_all()
+def fetch_ust(full=False):
+    save_fred(run_jobs(fred_jobs(UST_SERIES, full)), UST_SERIES, "UST")
+
+def fetch_indices(full=False):
+    save_indices(run_jobs(fred_jobs(INDEX_SERIES.values(), full)))
+
+def yahoo_job(full=False):
+    """One batched Yahoo download for every symbol, from the earliest gap among them."""
+    starts = [sync_start(sym, full) for sym in YAHOO_SYMBOLS]
+    since = None if None in starts else min(starts)
+    return Job("yahoo:batch", "yahoo", partial(data_access.yahoo_batch, list(YAHOO_SYMBOLS), since))
+
+def save_yahoo(frames):
+    return {sym: save_series(f"Yahoo {name}", sym, frames[sym]) for sym, name in YAHOO_SYMBOLS.items() if sym in frames}
+
+def save_yahoo_results(results):
+    r = results.get("yahoo:batch")
+    return save_yahoo(r.value) if r and r.ok else {}
+
+def fetch_yahoo(full=False):
+    save_yahoo_results(run_jobs([yahoo_job(full)]))
 
+def cbonds_jobs(full=False):
+    """One job running the rate-limited harvester over every configured ISIN and endpoint."""
+    import cbonds_harvester as cbh
+    return [Job("cbonds:harvest", "cbonds", partial(cbh.harvest, full=full), HARVEST_TIMEOUT)]
+
+def save_cbonds(results):
+    """The harvester has already merged its records; returns {"cbonds:<endpoint>": rows changed}."""
+    r = results.get("cbonds:harvest")
+    if not (r and r.ok):
+        return {}
+    changed, _ = r.value
+    return {f"cbonds:{ep}": n for ep, n in changed.items()}
+
+def cbonds_errors(results):
+    """Endpoint×ISIN queries that failed inside an otherwise successful harvest."""
+    r = results.get("cbonds:harvest")
+    return {f"cbonds:{pair}": err for pair, err in r.value[1].items()} if r and r.ok else {}
+
+# ======== SOURCES ========
+# Each source: how to build its jobs, how to store their results ({key: rows changed})
+# and, optionally, failures reported inside successful jobs ({name: error}).
+Source = namedtuple("Source", ["jobs", "save", "errors"], defaults=[None])
+SOURCES = {
+    "ust":     Source(lambda full: fred_jobs(UST_SERIES, full), lambda res: save_fred(res, UST_SERIES, "UST")),
+    "indices": Source(lambda full: fred_jobs(INDEX_SERIES.values(), full), save_indices),
+    "yahoo":   Source(lambda full: [yahoo_job(full)], save_yahoo_results),
+    "cbonds":  Source(cbonds_jobs, save_cbonds, cbonds_errors),
+}
+
+# Rolling analytics (returns / vol / drawdown) are brought up to date after these sources land;
+# bond yields / durations (bond_analytics.py) after every Cbonds harvest.
+ANALYTICS_SYMBOLS = {"yahoo": list(YAHOO_SYMBOLS), "indices": list(INDEX_SERIES.values())}
+
+def manifest():
+    return snapshots.manifest_path(DATA_DIR)
+
+def update_analytics(source, full=False):
+    """Append rolling analytics for the source's symbols; returns {"analytics:<symbol>": new rows}."""
+    changed = equity_analytics.update(STORE_DIR, os.path.join(DATA_DIR, "analytics"), ANALYTICS_SYMBOLS[source], full)
+    return {f"analytics:{sym}": n for sym, n in changed.items()}
+
+def update_bond_analytics(full=False):
+    """Yields / durations for the harvested bonds; returns {"bonds:<isin>": quotes recomputed}."""
+    import bond_analytics
+    import cbonds_harvester as cbh
+    return {f"bonds:{isin}": n for isin, n in bond_analytics.update(cbh.OUT_DIR, full).items()}
+
+def refresh(sources, full=False, only=None):
+    """Fetch the given sources in one concurrent batch, store them and publish a new snapshot.
+
+    Data files are swapped in atomically by the stores; the manifest version is
+    bumped per source only after all of that source's writes are done.
+    `only` ({source: job names}) limits a source to those jobs, e.g. to retry
+    the ones that failed last time. Failed jobs are recorded one by one; the
+    source itself only counts as failed if all of its jobs (or its save) did.
+    Returns {source: {job name: error}}.
+    """
+    started = time.perf_counter()
+    run = perf_log.Run("updater", sources=list(sources), full=full)
+    migrate_csvs()
+    jobs = {src: SOURCES[src].jobs(full) for src in sources}
+    for src, names in (only or {}).items():
+        jobs[src] = [j for j in jobs.get(src, []) if j.name in names] or jobs.get(src, [])
+    results = run_jobs([j for js in jobs.values() for j in js])
+    log_jobs(run, results)
+
+    status = {}
+    with run.section("save", cached=False) as sec, sec.stage("write"):
+        for src, js in jobs.items():
+            failed = {j.name: repr(results[j.name].error) for j in js if not results[j.name].ok}
+            error = f"all {len(js)} jobs failed" if js and len(failed) == len(js) else None
+            try:
+                changed = SOURCES[src].save(results)
+                failed.update(SOURCES[src].errors(results) if SOURCES[src].errors else {})
+                if src in ANALYTICS_SYMBOLS:
+                    changed.update(update_analytics(src, full))
+                if src == "cbonds":
+                    changed.update(update_bond_analytics(full))
+            except Exception as e:   # one source's store failing doesn't take the others down
+                print(f"[ERROR] {src}: saving failed: {e}")
+                changed, error = {}, repr(e)
+            version = snapshots.publish(manifest(), src, changed, error, failed)
+            note = f", {len(failed)} failed job(s)" if failed else ""
+            print(f"[SNAPSHOT] {src}: {sum(changed.values())} rows changed → v{version}{note}")
+            status[src] = failed if error is None else {src: error, **failed}
+    print_summary(results, time.perf_counter() - started)
+    run.write(perf_log.log_path(DATA_DIR))
+    return status
+
+def log_jobs(run, results):
+    """One perf-log record per job: fetch time, attempts, outcome and payload size."""
+    for r in results.values():
+        sec = run.add(r.name, r.seconds, source=r.source, ok=r.ok, attempts=r.attempts)
+        sec.stages["fetch"] = r.seconds
+        sec.error = None if r.ok else repr(r.error)
+        sec.count(r.value)
+
+def update_all(full=False, yahoo=False, cbonds=False):
+    """Run every FRED (and optionally Yahoo / Cbonds) job in one concurrent batch."""
+    sources = ["ust", "indices"] + (["yahoo"] if yahoo else []) + (["cbonds"] if cbonds else [])
+    return refresh(sources, full)
+
+# ======== DAEMON ========
+# Refresh times are local to each upstream's publishing calendar.
+#   ust:     H.15 yields land on FRED in the late afternoon ET
+#   indices: FRED index closes appear the next morning ET; a second pass catches late ones
+#   yahoo:   after the US cash close
+#   cbonds:  once a day, before the Dubai working day
+SCHEDULE = {
+    "ust":     {"tz": "America/New_York", "at": ["16:30", "18:30"], "weekdays": True},
+    "indices": {"tz": "America/New_York", "at": ["08:30", "17:00"], "weekdays": True},
+    "yahoo":   {"tz": "America/New_York", "at": ["16:20"], "weekdays": True},
+    "cbonds":  {"tz": "Asia/Dubai", "at": ["07:00"], "weekdays": False},
+}
+POLL_SECONDS = 60           # how often the daemon checks the schedule
+HEARTBEAT_SECONDS = 60      # how often it beats, from its own thread (also during long refreshes)
+RETRY_FAILED_AFTER = 15 * 60
+
+def last_slot(spec, now=None):
+    """Most recent scheduled refresh time at or before `now`, as an aware datetime."""
+    tz = ZoneInfo(spec["tz"])
+    local = (now or snapshots.now()).astimezone(tz)
+    for back in range(8):
+        day = local.date() - timedelta(days=back)
+        if spec.get("weekdays") and day.weekday() >= 5:
+            continue
+        for at in sorted(spec["at"], reverse=True):
+            slot = datetime.combine(day, dtime.fromisoformat(at), tz)
+            if slot <= local:
+                return slot
+    return None
+
+def due_sources(m, schedule=SCHEDULE, now=None):
+    """Sources whose latest slot has passed since their last successful refresh, or whose refresh
+    left failed jobs behind (failures retry after RETRY_FAILED_AFTER)."""
+    now = now or snapshots.now()
+    due = []
+    for src, spec in schedule.items():
+        slot = last_slot(spec, now)
+        info = m["sources"].get(src, {})
+        done = snapshots.refreshed_at(m, src)
+        attempted = datetime.fromisoformat(info["attempted"]) if info.get("attempted") else None
+        if slot is None or (done and done >= slot and not info.get("errors")):
+            continue
+        if attempted and attempted >= slot and (now - attempted).total_seconds() < RETRY_FAILED_AFTER:
+            continue
+        due.append(src)
+    return due
+
+def retry_only(m, sources, now=None):
+    """{source: failed job names} for due sources whose current slot already succeeded apart from those jobs."""
+    only = {}
+    for src in sources:
+        done, slot = snapshots.refreshed_at(m, src), last_slot(SCHEDULE[src], now)
+        errors = m["sources"].get(src, {}).get("errors") or {}
+        if done and slot and done >= slot and errors:
+            only[src] = set(errors)
+    return only
+
+def _heartbeat(stop, sources, every=HEARTBEAT_SECONDS):
+    """Beat until `stop` is set, independent of how long a refresh takes."""
+    while not stop.is_set():
+        try:
+            snapshots.heartbeat(manifest(), sources=sources)
+        except Exception as e:
+            print(f"[WARN] heartbeat failed: {e}")
+        stop.wait(every)
+
+def daemon(sources=None, poll=POLL_SECONDS):
+    """Refresh each source on its own schedule until interrupted (SIGINT/SIGTERM)."""
+    schedule = {s: SCHEDULE[s] for s in (sources or SCHEDULE)}
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    print(f"[DAEMON] Refreshing {', '.join(schedule)}; manifest → {manifest()}")
+    beat = threading.Thread(target=_heartbeat, args=(stop, list(schedule)), name="heartbeat", daemon=True)
+    beat.start()
+    while not stop.is_set():
+        m = snapshots.read(manifest())
+        due = due_sources(m, schedule)
+        if due:
+            only = retry_only(m, due)
+            print(f"[DAEMON] {datetime.now():%Y-%m-%d %H:%M} refreshing {', '.join(due)}"
+                  + (f" (retrying failed jobs of {', '.join(only)})" if only else ""))
+            try:
+                refresh(due, only=only)
+            except Exception as e:   # keep the daemon alive; the failure is retried after the backoff
+                for src in due:
+                    snapshots.publish(manifest(), src, error=repr(e))
+                print(f"[ERROR] refresh of {', '.join(due)} failed: {e}")
+        stop.wait(poll)
+    beat.join()
+    print("[DAEMON] Stopped.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh processed market data.")
+    parser.add_argument("--full", action="store_true", help="refetch full history instead of syncing incrementally")
+    parser.add_argument("--yahoo", action="store_true", help="also refresh Yahoo index closes")
+    parser.add_argument("--cbonds", action="store_true", help="also harvest Cbonds data for the configured ISINs")
+    parser.add_argument("--daemon", action="store_true", help="keep running and refresh each source on its schedule")
+    parser.add_argument("--sources", nargs="+", choices=list(SCHEDULE), help="sources the daemon refreshes (default: all)")
+    args = parser.parse_args()
+    if args.daemon:
+        daemon(args.sources)
+    else:
+        update_all(full=args.full, yahoo=args.yahoo, cbonds=args.cbonds)
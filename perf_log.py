@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Per-section timing for the dashboard and the updater.
+
+A Run holds one record per dashboard section or updater job. Each record has
+wall time split into named stages (fetch / transform / render), cache hit or
+miss, row and byte counts, and any error. Finished runs are appended to a
+rotating JSONL log, one line per record:
+
+    python perf_log.py            # slowest sections over the last 200 runs
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import argparse
+import threading
+import cProfile
+import io
+import pstats
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+import numpy as np
+import pandas as pd
+
+DEFAULT_DATA_DIR = os.path.expanduser("~/Documents/PythonProjects/MarketData/data/processed")
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 3
+
+_local = threading.local()
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+def log_path(data_dir=DEFAULT_DATA_DIR):
+    """$MARKETDATA_PERF_LOG if set, else <data_dir>/logs/perf.jsonl."""
+    return os.getenv("MARKETDATA_PERF_LOG") or os.path.join(data_dir, "logs", "perf.jsonl")
+
+def note_miss(name):
+    """Call at the top of a cached function body: it only runs on a cache miss."""
+    if not hasattr(_local, "misses"):
+        _local.misses = []
+    _local.misses.append(name)
+
+def _misses():
+    return list(getattr(_local, "misses", []))
+
+def size_of(obj):
+    """(rows, bytes) for a frame, series, array or a dict/list of them."""
+    if obj is None:
+        return 0, 0
+    if isinstance(obj, pd.DataFrame):
+        return len(obj), int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return len(obj), int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return len(obj), obj.nbytes
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        if obj and all(isinstance(o, dict) for o in obj):   # JSON records
+            return len(obj), len(json.dumps(obj, default=str))
+        sizes = [size_of(o) for o in obj]
+        return sum(r for r, _ in sizes), sum(b for _, b in sizes)
+    return 0, 0
+
+class Section:
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.rows = self.bytes = 0
+        self.cache = None
+        self.error = None
+        self.seconds = 0.0
+        self.extra = {}
+
+    @contextmanager
+    def stage(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t
+
+    def count(self, obj):
+        """Add obj's rows and bytes to this section; returns obj so it can wrap an expression."""
+        rows, nbytes = size_of(obj)
+        self.rows += rows
+        self.bytes += nbytes
+        return obj
+
+    def record(self):
+        stages = dict(self.stages)
+        if stages and "transform" not in stages:   # whatever was not fetch/render/... is transform
+            stages["transform"] = max(self.seconds - sum(stages.values()), 0.0)
+        return {"section": self.name, "seconds": round(self.seconds, 6),
+                **{f"{k}_s": round(v, 6) for k, v in stages.items()},
+                "cache": self.cache, "rows": self.rows, "bytes": self.bytes, "error": self.error, **self.extra}
+
+class Run:
+    """One dashboard rerun or one updater invocation."""
+    def __init__(self, kind, **meta):
+        self.kind, self.meta = kind, meta
+        self.id = uuid.uuid4().hex[:12]
+        self.started = datetime.now()
+        self._t0 = time.perf_counter()
+        self.sections = []
+        _local.misses = []
+
+    @contextmanager
+    def section(self, name, cached=True):
+        """Time a block; for cached sections, 'miss' if any note_miss() fired inside it, else 'hit'."""
+        sec = Section(name)
+        before = len(_misses())
+        t = time.perf_counter()
+        try:
+            yield sec
+        except Exception as e:
+            sec.error = repr(e)
+            raise
+        finally:
+            sec.seconds = time.perf_counter() - t
+            missed = _misses()[before:]
+            if cached and sec.cache is None:
+                sec.cache = "miss" if missed else "hit"
+            if missed:
+                sec.extra["missed"] = sorted(set(missed))
+            self.sections.append(sec)
+
+    def add(self, name, seconds, **fields):
+        """Record a section that was timed elsewhere (e.g. an updater job)."""
+        sec = Section(name)
+        sec.seconds = seconds
+        sec.extra.update(fields)
+        self.sections.append(sec)
+        return sec
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self._t0
+
+    def records(self):
+        head = {"run": self.id, "kind": self.kind, "ts": self.started.isoformat(timespec="seconds"), **self.meta}
+        return [{**head, **s.record()} for s in self.sections] + \
+               [{**head, "section": "_total", "seconds": round(self.seconds, 6)}]
+
+    def frame(self):
+        return pd.DataFrame([s.record() for s in self.sections])
+
+    def write(self, path=None):
+        """Append this run to the rotating JSONL log; logging failures never break the caller."""
+        try:
+            log = _logger(path or log_path())
+            for rec in self.records():
+                log.info(json.dumps(rec, default=str))
+        except Exception as e:
+            print(f"[WARN] perf log not written: {e!r}")
+
+def _logger(path):
+    with _loggers_lock:
+        if path not in _loggers:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            log = logging.getLogger(f"marketdata.perf.{path}")
+            log.setLevel(logging.INFO)
+            log.propagate = False
+            handler = RotatingFileHandler(path, maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            log.addHandler(handler)
+            _loggers[path] = log
+        return _loggers[path]
+
+class Profile:
+    """cProfile capture around an arbitrary stretch of code (e.g. one dashboard rerun)."""
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self, dump_path=None, top=30):
+        """Stop profiling; optionally save a .prof file and return the top entries by cumulative time."""
+        self.profiler.disable()
+        if dump_path:
+            os.makedirs(os.path.dirname(dump_path) or ".", exist_ok=True)
+            self.profiler.dump_stats(dump_path)
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(top)
+        return out.getvalue()
+
+def read_log(path=None):
+    """All records from the current log and its rotated backups, oldest first."""
+    path = path or log_path()
+    files = [f"{path}.{i}" for i in range(BACKUPS, 0, -1)] + [path]
+    rows = []
+    for f in files:
+        if os.path.exists(f):
+            with open(f, encoding="utf-8") as fh:
+                rows += [json.loads(line) for line in fh if line.strip()]
+    return pd.DataFrame(rows)
+
+def summary(df, last_runs=200):
+    """Median / p90 seconds and cache-miss rate per (kind, section) over the most recent runs."""
+    if df.empty:
+        return df
+    df = df[df["run"].isin(df["run"].drop_duplicates().tail(last_runs))]
+    g = df.groupby(["kind", "section"])
+    out = g["seconds"].agg(runs="count", median="median", p90=lambda s: s.quantile(0.9))
+    if "cache" in df:
+        out["miss_rate"] = g["cache"].apply(lambda s: (s.dropna() == "miss").mean())
+    return out.sort_values("median", ascending=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the dashboard/updater performance log.")
+    parser.add_argument("--log", default=log_path())
+    parser.add_argument("--runs", type=int, default=200, help="how many recent runs to include")
+    args = parser.parse_args()
+    with pd.option_context("display.width", 140, "display.float_format", "{:.3f}".format):
+        print(summary(read_log(args.log), args.runs))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""SQLite-backed property holdings.
+
+Every add or delete is a single-row transaction. The database runs in WAL mode
+with a busy timeout, so several dashboard sessions can edit at once without
+overwriting each other. CSV files are supported for batch import and export
+only. Valuation joins holdings to the Pulse area aggregates in one vectorized
+step.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+import pandas as pd
+
+SQFT_PER_SQM = 10.7639
+COLUMNS = ["id", "Location", "Price", "Area_ft2"]
+
+class PortfolioStore:
+    def __init__(self, path, legacy_csv=None):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""CREATE TABLE IF NOT EXISTS holdings (
+                               id INTEGER PRIMARY KEY AUTOINCREMENT,
+                               location TEXT NOT NULL,
+                               price REAL NOT NULL,
+                               area_ft2 REAL NOT NULL,
+                               added_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)""")
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if legacy_csv and os.path.exists(legacy_csv):
+            with self._connect() as con:
+                # claiming the flag and importing share one transaction, so only one session migrates
+                claimed = con.execute("INSERT OR IGNORE INTO meta VALUES ('csv_imported', ?)", (legacy_csv,)).rowcount
+                if claimed:
+                    self._insert_csv(con, legacy_csv)
+
+    @contextmanager
+    def _connect(self):
+        """One short-lived connection per operation: commit on success, always close."""
+        con = sqlite3.connect(self.path, timeout=10)
+        try:
+            con.execute("PRAGMA busy_timeout = 10000")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def add(self, location, price, area_ft2):
+        """Insert one holding and return its id."""
+        with self._connect() as con:
+            cur = con.execute("INSERT INTO holdings (location, price, area_ft2) VALUES (?, ?, ?)",
+                              (location, float(price), float(area_ft2)))
+            return cur.lastrowid
+
+    def delete(self, ids):
+        """Delete holdings by id; returns how many rows went."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return 0
+        with self._connect() as con:
+            return con.executemany("DELETE FROM holdings WHERE id = ?", [(i,) for i in ids]).rowcount
+
+    def holdings(self):
+        with self._connect() as con:
+            df = pd.read_sql_query("SELECT id, location, price, area_ft2 FROM holdings ORDER BY id", con)
+        df.columns = COLUMNS
+        return df
+
+    def import_csv(self, file):
+        """Append Location/Price/Area_ft2 rows from a CSV (path or buffer) in one transaction."""
+        with self._connect() as con:
+            return self._insert_csv(con, file)
+
+    @staticmethod
+    def _insert_csv(con, file):
+        df = pd.read_csv(file, usecols=["Location", "Price", "Area_ft2"]).dropna()
+        con.executemany("INSERT INTO holdings (location, price, area_ft2) VALUES (?, ?, ?)",
+                        df[["Location", "Price", "Area_ft2"]].itertuples(index=False, name=None))
+        return len(df)
+
+    def export_csv(self, file=None):
+        """Write holdings as CSV to `file`, or return the CSV text when no file is given."""
+        return self.holdings().drop(columns="id").to_csv(file, index=False)
+
+def valuation(holdings, area_ppsm, matcher):
+    """Add per-unit AED/m² and AED/ft² figures vs. the matched area's market mean."""
+    df = holdings.copy()
+    df["Area_m2"] = df["Area_ft2"] / SQFT_PER_SQM
+    df["Your_PPSM"] = df["Price"] / df["Area_m2"]
+    df["Matched_Location"] = matcher.match_many(df["Location"])
+    df["Market_PPSM"] = df["Matched_Location"].map(area_ppsm)
+    df["Change_%"] = (df["Market_PPSM"] / df["Your_PPSM"] - 1) * 100
+    df["Your_PPSF"] = df["Your_PPSM"] / SQFT_PER_SQM
+    df["Market_PPSF"] = df["Market_PPSM"] / SQFT_PER_SQM
+    return df
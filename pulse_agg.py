@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Per-area price aggregates for Dubai Pulse transaction dumps.
+
+The source Parquet is streamed in record batches, one row group at a time, and
+only the needed columns are read. Each batch is folded into per-(area, month)
+t-digests (see tdigest.py), then dropped. Memory therefore depends on the
+number of areas × months, not on the size of the dump.
+
+The digests are persisted as one small Parquet file. Its name is keyed by the
+source's path, size and mtime, so reruns and restarts reuse it until a new
+dump lands.
+
+Views are derived from the digests on demand:
+- all-time or trailing-window per-area stats (area_stats(..., months=12))
+- the per-month series (monthly_stats)
+Counts and means are exact. Medians and quartiles are t-digest estimates,
+exact for areas whose digests haven't merged any points yet.
+
+    python pulse_agg.py dump.parquet --months 3     # print the last 3 months by area
+"""
+import os
+import glob
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from tdigest import GroupDigest
+
+AREA_COL = "area_name_en"
+PROJECT_COL = "project_name_en"
+PRICE_COL = "meter_sale_price"
+DATE_COL = "instance_date"
+SQFT_PER_SQM = 10.7639
+BATCH_ROWS = 128 * 1024
+MONTH_BITS = 20   # group key = area id << MONTH_BITS | month code (year * 12 + month - 1; 0 = undated)
+
+def newest_parquet(folder):
+    """Most recently modified *.parquet in `folder`, or None."""
+    files = glob.glob(os.path.join(folder, "*.parquet"))
+    return max(files, key=os.path.getmtime) if files else None
+
+def cache_key(path):
+    st = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+def iter_batches(path, columns, batch_size=BATCH_ROWS):
+    """Pandas frames of `columns` (those present in the file), one bounded batch at a time.
+
+    Text columns come back as categoricals, so per-row strings are never materialized.
+    """
+    # pre_buffer would cache every column chunk read so far, i.e. grow with the file
+    pf = pq.ParquetFile(path, pre_buffer=False,
+                        read_dictionary=[c for c in (AREA_COL, PROJECT_COL) if c in columns])
+    cols = [c for c in columns if c in pf.schema_arrow.names]
+    for batch in pf.iter_batches(batch_size=batch_size, columns=cols):
+        yield batch.to_pandas()
+
+def _ids(values, table):
+    """Global integer ids for a batch of labels, stripped; -1 for missing or blank.
+
+    `table` ({label: id}) grows as new labels appear; only the batch's distinct labels are touched.
+    """
+    codes, uniques = pd.factorize(values)
+    labels = pd.Series(np.asarray(uniques, dtype=object), dtype="string").str.strip()
+    ids = [-1 if pd.isna(u) or u == "" else table.setdefault(u, len(table)) for u in labels]
+    return np.array(ids + [-1], dtype=np.int64)[codes]
+
+def _month_codes(dates):
+    """year * 12 + month - 1 per row, 0 where the date is missing or unparseable."""
+    if not pd.api.types.is_datetime64_any_dtype(dates):   # text dates in older dumps
+        dates = pd.to_datetime(dates, errors="coerce")
+    m = dates.to_numpy().astype("datetime64[M]")
+    return np.where(np.isnat(m), 0, m.astype(np.int64) + 1970 * 12)
+
+def compute_digest(path, batch_size=BATCH_ROWS):
+    """Stream the dump into per-(area, month) digests; returns a frame of centroids.
+
+    Columns: area, month (first of month, NaT if the row had no date), mean (AED/m²), weight.
+    """
+    areas, digest = {}, GroupDigest()
+    for df in iter_batches(path, [AREA_COL, PRICE_COL, DATE_COL], batch_size):
+        area = _ids(df[AREA_COL], areas)
+        price = pd.to_numeric(df[PRICE_COL], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        ok = (area >= 0) & ~np.isnan(price)
+        if not ok.any():
+            continue
+        month = _month_codes(df[DATE_COL][ok]) if DATE_COL in df else np.zeros(ok.sum(), np.int64)
+        digest.add((area[ok] << MONTH_BITS) | month, price[ok])
+    digest.compress()
+    code = digest.group & ((1 << MONTH_BITS) - 1)
+    month = (code - 1970 * 12).astype("datetime64[M]").astype("datetime64[ns]")
+    return pd.DataFrame({
+        "area": pd.Categorical.from_codes(digest.group >> MONTH_BITS, categories=list(areas)).set_categories(sorted(areas)),
+        "month": np.where(code > 0, month, np.datetime64("NaT")),
+        "mean": digest.mean,
+        "weight": digest.weight,
+    })
+
+def compute_project_areas(path, batch_size=BATCH_ROWS):
+    """Most frequent area for every project name (empty if the dump has no project column)."""
+    if PROJECT_COL not in pq.read_schema(path).names:
+        return pd.DataFrame({AREA_COL: pd.Series(dtype="string")}, index=pd.Index([], name=PROJECT_COL))
+    counts = None
+    for df in iter_batches(path, [PROJECT_COL, AREA_COL], batch_size):
+        df = df.dropna()
+        df[AREA_COL] = df[AREA_COL].astype("string").str.strip()
+        n = df.groupby([df[PROJECT_COL].astype("string"), AREA_COL]).size()
+        counts = n if counts is None else counts.add(n, fill_value=0)
+    if counts is None:
+        counts = pd.Series(dtype="int64", index=pd.MultiIndex.from_tuples([], names=[PROJECT_COL, AREA_COL]))
+    top = counts.reset_index(name="n").sort_values("n").drop_duplicates(PROJECT_COL, keep="last")
+    return top.set_index(PROJECT_COL)[[AREA_COL]]
+
+def _cached(kind, path, cache_dir, compute):
+    cached = os.path.join(cache_dir, f"{kind}_{cache_key(path)}.parquet")
+    if os.path.exists(cached):
+        return pd.read_parquet(cached)
+    result = compute(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(cache_dir, f"{kind}_*.parquet")):
+        os.remove(old)
+    tmp = f"{cached}.tmp-{os.getpid()}"
+    result.to_parquet(tmp)
+    os.replace(tmp, cached)
+    return result
+
+def digest(path, cache_dir):
+    """Centroid frame for `path` (see compute_digest), read from / written to the keyed cache."""
+    return _cached("pulse_digest", path, cache_dir, compute_digest)
+
+def window(cents, months=None):
+    """Centroids from the trailing `months` calendar months of the data (all rows if None).
+
+    The window ends at the newest month in the dump, not today, since dumps lag.
+    """
+    if not months:
+        return cents
+    last = cents["month"].max()
+    if pd.isna(last):
+        return cents.iloc[:0]
+    return cents[cents["month"] > last - pd.DateOffset(months=months)]
+
+def _summarize(cents, by):
+    """count / mean / quartiles in AED/m² per distinct `by` tuple, merging the digests of each group."""
+    grouped = cents.groupby(by, observed=True, dropna=False)
+    labels = grouped.size().index
+    g, count, mean, q = GroupDigest(group=grouped.ngroup().to_numpy(), mean=cents["mean"].to_numpy(),
+                                    weight=cents["weight"].to_numpy()).summary()
+    return pd.DataFrame({"count": count.round().astype("int64"), "mean_psm": mean, "median_psm": q[0.5],
+                         "p25_psm": q[0.25], "p75_psm": q[0.75]}, index=labels[g])
+
+def compute_area_stats(cents, months=None):
+    """Per-area count, mean, median and quartiles (AED/m² and AED/ft²) from digest centroids."""
+    stats = _summarize(window(cents, months), "area")
+    stats.index = pd.Index(stats.index.astype("string"), name=AREA_COL)
+    stats["mean_psf"] = stats["mean_psm"] / SQFT_PER_SQM
+    stats["median_psf"] = stats["median_psm"] / SQFT_PER_SQM
+    return stats.sort_index()
+
+def area_stats(path, cache_dir, months=None):
+    """Per-area aggregates for `path`, all-time or over the last `months`; each window is cached like the digests."""
+    kind = f"area_stats_{months}m" if months else "area_stats_all"
+    return _cached(kind, path, cache_dir, lambda p: compute_area_stats(digest(p, cache_dir), months))
+
+def monthly_stats(path, cache_dir, months=None):
+    """(area, month) × count / mean / median / quartiles AED/m², for dated rows only."""
+    cents = window(digest(path, cache_dir), months)
+    return _summarize(cents[cents["month"].notna()], ["area", "month"]).sort_index()
+
+def project_areas(path, cache_dir):
+    """{project name: area} for `path`, cached like the digests."""
+    return _cached("project_areas", path, cache_dir, compute_project_areas)[AREA_COL].to_dict()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-area price stats from a Dubai Pulse transactions dump.")
+    parser.add_argument("path", nargs="?", help="Parquet dump (default: newest in --folder)")
+    parser.add_argument("--folder", default=os.path.expanduser("~/Documents/PythonProjects/PropertyFinder/data/dubai_pulse/processed"))
+    parser.add_argument("--cache", default=os.path.expanduser("~/Documents/PythonProjects/MarketData/data/processed/pulse_agg"))
+    parser.add_argument("--months", type=int, help="trailing window in months (default: all time)")
+    args = parser.parse_args()
+    path = args.path or newest_parquet(args.folder)
+    if not path:
+        raise SystemExit(f"No Parquet dump in {args.folder}")
+    with pd.option_context("display.max_rows", None, "display.width", 160):
+        print(area_stats(path, args.cache, args.months).round(0))
@@ -1,8 +1,6 @@
 #!/usr/bin/env python3
-import smtplib
 import getpass
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import mailer
 
 # === Your details ===
 sender_name = "Timur Vagizov"
@@ -49,20 +47,14 @@ Email: {email}
 # === Ask for password securely ===
 password = getpass.getpass("Enter your Gmail app password (will not be shown): ")
 
-# === Send emails ===
-def send_email(to_addr, vendor_name):
-    msg = MIMEMultipart("alternative")
-    msg["From"] = email
-    msg["To"] = to_addr
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body.format(vendor_name=vendor_name), "plain", "utf-8"))
-
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-        smtp.login(email, password)
-        smtp.send_message(msg)
-        print(f"✅ Sent to {vendor_name} ({to_addr})")
+# === Send emails (one Gmail login for the whole batch) ===
+messages = [mailer.message(email, addr, subject, body.format(vendor_name=vendor)) for vendor, addr in vendors.items()]
+failed = mailer.send_smtp(messages, email, password, sessions=1)
 
 for vendor, addr in vendors.items():
-    send_email(addr, vendor)
+    if addr in failed:
+        print(f"❌ Failed to send to {vendor} ({addr}): {failed[addr]}")
+    else:
+        print(f"✅ Sent to {vendor} ({addr})")
 
-print("\nAll messages sent successfully via Gmail.")
+print("\nAll messages sent successfully via Gmail." if not failed else f"\n{len(failed)} message(s) failed.")
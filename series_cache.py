@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Disk-backed upstream response cache shared by every dashboard process.
+
+The Parquet store keeps the history. This cache remembers what upstream
+(FRED, Yahoo) last answered for a series, and when. Replicas and restarts
+therefore don't each re-ask for the same gap, which matters most while a
+source hasn't published its next observation yet.
+
+- One SQLite file (WAL mode). Entries are keyed by (source, series) and cover
+  [start, time of fetch].
+- A fetch from `since` is served from any fresh entry whose range starts on
+  or before `since`, so a 5y request is answered from a cached 10y fetch.
+- A newer fetch that overlaps an entry is merged into it.
+- Entries older than `ttl` are not served. Once the total exceeds
+  `max_rows`, expired entries are evicted first, then the least recently used.
+- fetch() is single-flight across processes (an flock per source and series,
+  taken in sorted order). One replica calls upstream; the others wait and then
+  read its answer.
+- Upstream failures are recorded per series. For FAIL_BACKOFF every process
+  skips those series (they come back as None) but still fetches the rest.
+
+    python series_cache.py ~/.../data/processed/cache/series.sqlite       # entries and sizes
+"""
+import os
+import time
+import fcntl
+import sqlite3
+import hashlib
+import argparse
+from contextlib import contextmanager, ExitStack
+import pandas as pd
+
+TTL = 15 * 60              # seconds an upstream answer is reused
+MAX_ROWS = 2_000_000       # cached observations across all entries before LRU eviction
+FAIL_BACKOFF = 5 * 60      # seconds every process waits after an upstream failure
+LOCK_TIMEOUT = 60          # seconds to wait for another process's fetch of the same series
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    source TEXT, series TEXT, start TEXT, fetched REAL, accessed REAL, rows INTEGER,
+    PRIMARY KEY (source, series));
+CREATE TABLE IF NOT EXISTS points (
+    source TEXT, series TEXT, date TEXT, value REAL,
+    PRIMARY KEY (source, series, date)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS failures (
+    source TEXT, series TEXT, at REAL, error TEXT,
+    PRIMARY KEY (source, series));
+"""
+
+def _day(ts):
+    return f"{pd.Timestamp(ts):%Y-%m-%d}"
+
+class SeriesCache:
+    def __init__(self, path, ttl=TTL, max_rows=MAX_ROWS, fail_backoff=FAIL_BACKOFF):
+        self.path, self.ttl, self.max_rows, self.fail_backoff = path, ttl, max_rows, fail_backoff
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        """A short-lived connection per call: safe from any thread, and one transaction per block."""
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.execute("PRAGMA busy_timeout=30000")
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    # ---------- entries ----------
+    def get(self, source, series, since):
+        """Cached (date, value) rows on/after `since` if a fresh entry covers it, else None."""
+        now = time.time()
+        with self._db() as db:
+            row = db.execute("SELECT start, fetched FROM entries WHERE source=? AND series=?",
+                             (source, series)).fetchone()
+            if not row or row[0] > _day(since) or now - row[1] > self.ttl:
+                return None
+            db.execute("UPDATE entries SET accessed=? WHERE source=? AND series=?", (now, source, series))
+            rows = db.execute("SELECT date, value FROM points WHERE source=? AND series=? AND date>=? ORDER BY date",
+                              (source, series, _day(since))).fetchall()
+        return pd.DataFrame({"date": pd.to_datetime([r[0] for r in rows]), "value": [r[1] for r in rows]})
+
+    def put(self, source, series, since, df, fetched=None):
+        """Store upstream's answer for [since, now], merging it with an overlapping entry."""
+        now = fetched or time.time()
+        since = _day(since)
+        df = df.dropna(subset=["date"]) if df is not None else pd.DataFrame(columns=["date", "value"])
+        rows = [(source, series, _day(d), None if pd.isna(v) else float(v))
+                for d, v in zip(df["date"], df["value"]) if _day(d) >= since]
+        with self._transaction() as db:
+            old = db.execute("SELECT start, fetched FROM entries WHERE source=? AND series=?",
+                             (source, series)).fetchone()
+            # the old entry knew everything up to its fetch time; if the new range starts by then they join up
+            start = min(old[0], since) if old and since <= _day(pd.Timestamp(old[1], unit="s")) else since
+            if start == since:
+                db.execute("DELETE FROM points WHERE source=? AND series=?", (source, series))
+            else:
+                db.execute("DELETE FROM points WHERE source=? AND series=? AND date>=?", (source, series, since))
+            db.executemany("INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?)", rows)
+            n = db.execute("SELECT COUNT(*) FROM points WHERE source=? AND series=?", (source, series)).fetchone()[0]
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", (source, series, start, now, now, n))
+            db.execute("DELETE FROM failures WHERE source=? AND series=?", (source, series))
+            self._evict(db, now)
+
+    def _evict(self, db, now):
+        total = db.execute("SELECT COALESCE(SUM(rows), 0) FROM entries").fetchone()[0]
+        if total <= self.max_rows:
+            return
+        victims = db.execute("SELECT source, series, rows FROM entries ORDER BY (fetched < ?) DESC, accessed",
+                             (now - self.ttl,)).fetchall()
+        for source, series, n in victims:
+            if total <= self.max_rows:
+                break
+            db.execute("DELETE FROM points WHERE source=? AND series=?", (source, series))
+            db.execute("DELETE FROM entries WHERE source=? AND series=?", (source, series))
+            total -= n
+
+    # ---------- single-flight upstream calls ----------
+    @contextmanager
+    def _locked(self, source, series_ids):
+        """Cross-process locks for each (source, series), taken in sorted order so overlapping
+        sets can't deadlock; waits up to LOCK_TIMEOUT in total for the current holders."""
+        lock_dir = os.path.join(os.path.dirname(os.path.abspath(self.path)), "locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        with ExitStack() as stack:
+            for sid in sorted(set(series_ids)):
+                key = hashlib.sha1(f"{source}|{sid}".encode()).hexdigest()[:16]
+                lock = stack.enter_context(open(os.path.join(lock_dir, f"{key}.lock"), "w"))
+                while True:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"{source}: another process is still fetching {sid}")
+                        time.sleep(0.05)
+                stack.callback(fcntl.flock, lock, fcntl.LOCK_UN)
+            yield
+
+    def _recent_failures(self, db, source, series_ids):
+        """{series: (at, error)} for the series that failed upstream within fail_backoff."""
+        marks = ",".join("?" * len(series_ids))
+        rows = db.execute(f"SELECT series, at, error FROM failures WHERE source=? AND series IN ({marks}) "
+                          "AND at > ?", (source, *series_ids, time.time() - self.fail_backoff)).fetchall()
+        return {sid: (at, error) for sid, at, error in rows}
+
+    def fetch(self, source, series_ids, since, fetch):
+        """{series_id: rows on/after since}, calling fetch(missing ids) -> {id: frame} only for what isn't cached.
+
+        Concurrent callers for the same series (in any process) wait for one upstream call and share it.
+        Series that failed upstream within fail_backoff are not asked for again and map to None.
+        """
+        out = {sid: self.get(source, sid, since) for sid in series_ids}
+        missing = [sid for sid, df in out.items() if df is None]
+        if not missing:
+            return out
+        with self._locked(source, missing):
+            out.update({sid: self.get(source, sid, since) for sid in missing})   # filled while we waited?
+            missing = [sid for sid in missing if out[sid] is None]
+            if not missing:
+                return out
+            with self._db() as db:
+                failed = self._recent_failures(db, source, missing)
+            for sid, (at, error) in failed.items():
+                print(f"[WARN] {source}:{sid} failed {time.time() - at:.0f}s ago ({error}); backing off")
+            missing = [sid for sid in missing if sid not in failed]
+            if not missing:
+                return out
+            try:
+                fetched = fetch(missing)
+            except Exception as e:
+                with self._transaction() as db:
+                    db.executemany("INSERT OR REPLACE INTO failures VALUES (?, ?, ?, ?)",
+                                   [(source, sid, time.time(), repr(e)[:200]) for sid in missing])
+                raise
+            for sid in missing:
+                self.put(source, sid, since, fetched.get(sid))
+                out[sid] = self.get(source, sid, since)
+        return out
+
+    def entries(self):
+        """One row per cached series: range start, age, idle time and size."""
+        with self._db() as db:
+            df = pd.read_sql_query("SELECT source, series, start, fetched, accessed, rows FROM entries", db)
+        now = time.time()
+        df["age_s"], df["idle_s"] = (now - df.pop("fetched")).round(), (now - df.pop("accessed")).round()
+        return df.sort_values(["source", "series"], ignore_index=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the shared upstream series cache.")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    with pd.option_context("display.max_rows", None, "display.width", 160):
+        print(SeriesCache(args.path).entries())
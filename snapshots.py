@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Published-snapshot manifest shared by the updater daemon and the dashboard.
+
+Writers replace data files atomically (temp file + os.replace) first. Only then
+do they bump versions here. The manifest tracks:
+- a global version
+- one version per series key (a FRED/Yahoo id or "cbonds:<endpoint>")
+- per-source refresh status, with the jobs that failed
+- the daemon's heartbeat
+
+Readers key their caches on the versions they use. They keep serving the
+previous snapshot until a newer one is published, and they reload only the
+series whose version moved.
+"""
+import os
+import json
+import fcntl
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+MANIFEST = "snapshot.json"
+HEARTBEAT_MAX_AGE = 5 * 60   # seconds; older than this and the daemon is considered down
+
+def manifest_path(data_dir):
+    return os.path.join(data_dir, MANIFEST)
+
+def now():
+    return datetime.now(timezone.utc)
+
+def read(path):
+    """Current manifest, or an empty one if nothing has been published yet."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            m = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        m = {}
+    m.setdefault("version", 0)
+    m.setdefault("series", {})
+    m.setdefault("sources", {})
+    m.setdefault("heartbeat", None)
+    return m
+
+@contextmanager
+def _locked(path):
+    """Serialize read-modify-write cycles between the daemon, manual runs and dashboard top-ups."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _write(path, m):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(m, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def publish(path, source, changed=None, error=None, job_errors=None):
+    """Record a refresh of `source`; series in `changed` ({key: rows}) with rows > 0 get a new version.
+
+    `error` means the refresh as a whole failed. `job_errors` ({job: error})
+    lists individual failures of a refresh that otherwise landed.
+    """
+    changed = {k: n for k, n in (changed or {}).items() if n}
+    with _locked(path):
+        m = read(path)
+        if changed:
+            m["version"] += 1
+            for key in changed:
+                m["series"][key] = m["version"]
+        prev = m["sources"].get(source, {})
+        m["sources"][source] = {
+            "attempted": now().isoformat(timespec="seconds"),
+            "refreshed": now().isoformat(timespec="seconds") if error is None else prev.get("refreshed"),
+            "ok": error is None and not job_errors,
+            "error": error,
+            "errors": job_errors or {},
+            "changed": sum(changed.values()),
+            "version": m["version"] if changed else prev.get("version", 0),
+        }
+        _write(path, m)
+    return m["version"]
+
+def heartbeat(path, **info):
+    with _locked(path):
+        m = read(path)
+        m["heartbeat"] = {"at": now().isoformat(timespec="seconds"), "pid": os.getpid(), **info}
+        _write(path, m)
+
+def daemon_alive(m, max_age=HEARTBEAT_MAX_AGE):
+    hb = m.get("heartbeat")
+    if not hb:
+        return False
+    return (now() - datetime.fromisoformat(hb["at"])).total_seconds() < max_age
+
+def versions(m, keys):
+    """((key, version), ...) for cache keys; 0 for series never published."""
+    return tuple((k, m["series"].get(k, 0)) for k in keys)
+
+def refreshed_at(m, source):
+    """Last successful refresh of `source` as an aware datetime, or None."""
+    ts = m["sources"].get(source, {}).get("refreshed")
+    return datetime.fromisoformat(ts) if ts else None
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Mergeable t-digests for many groups at once.
+
+All groups share three flat arrays (group key, centroid mean, centroid weight).
+Adding points, merging digests and compressing are vectorized NumPy passes
+over those arrays. Memory is bounded by groups × (delta/2 + 1) centroids plus
+a fixed buffer of BUFFER raw points, no matter how many points went in.
+
+Compression preserves each group's total weight and weighted sum exactly.
+Counts and means are therefore exact. Quantiles are exact (numpy.quantile's
+linear interpolation) for groups whose points are all still single
+centroids, and approximate once points have been merged (tighter toward the
+tails, as with any k1-scale t-digest).
+"""
+import numpy as np
+
+DELTA = 100   # compression: at most DELTA/2 + 1 centroids per group
+BUFFER = 1024 * 1024   # raw points buffered between compressions
+
+class GroupDigest:
+    def __init__(self, delta=DELTA, group=None, mean=None, weight=None):
+        self.delta = delta
+        self.group = np.empty(0, np.int64) if group is None else np.asarray(group, np.int64)
+        self.mean = np.empty(0, float) if mean is None else np.asarray(mean, float)
+        self.weight = np.empty(0, float) if weight is None else np.asarray(weight, float)
+        self._compressed = 0   # centroid count after the last compress()
+        self._pending, self._pending_n = [], 0   # appended (group, mean, weight) chunks not yet folded in
+
+    def __len__(self):
+        return len(self.group) + self._pending_n
+
+    def add(self, groups, values):
+        """Add raw points (weight 1). They are folded in by compress() once BUFFER of them are pending."""
+        self._append(np.asarray(groups, np.int64), np.asarray(values, float), np.ones(len(values)))
+
+    def merge(self, other):
+        """Fold another GroupDigest (e.g. from another file or shard) into this one."""
+        other._flush()
+        self._append(other.group, other.mean, other.weight)
+        return self
+
+    def _append(self, g, m, w):
+        self._pending.append((g, m, w))
+        self._pending_n += len(g)
+        if self._pending_n > BUFFER:
+            self.compress()
+
+    def _flush(self):
+        if self._pending:
+            g, m, w = zip(*self._pending)
+            self.group = np.concatenate([self.group, *g])
+            self.mean = np.concatenate([self.mean, *m])
+            self.weight = np.concatenate([self.weight, *w])
+            self._pending, self._pending_n = [], 0
+
+    def compress(self):
+        """Merge neighbouring centroids so each spans at most one unit of the k1 scale within its group."""
+        self._flush()
+        if len(self.group) == self._compressed:   # nothing added since the last pass
+            return self
+        g, m, w = _sorted(self.group, self.mean, self.weight)
+        self.group = self.mean = self.weight = None   # drop the unsorted copies before the temporaries below
+        starts, sizes = _runs(g)
+        # q = centre of each centroid on its group's cumulative weight, in [0, 1]; built in place
+        q = np.cumsum(w)
+        q -= np.repeat(q[starts] - w[starts], sizes)
+        q -= w / 2
+        q /= np.repeat(np.add.reduceat(w, starts), sizes)
+        np.clip(2 * q - 1, -1, 1, out=q)
+        k = np.floor(self.delta / (2 * np.pi) * (np.arcsin(q, out=q) + np.pi / 2)).astype(np.int64)
+        del q
+        b = np.flatnonzero(np.r_[True, (g[1:] != g[:-1]) | (k[1:] != k[:-1])])
+        del k
+        self.weight = np.add.reduceat(w, b)
+        w *= m
+        self.mean = np.add.reduceat(w, b) / self.weight
+        self.group = g[b]
+        self._compressed = len(self.group)
+        return self
+
+    def summary(self, qs=(0.25, 0.5, 0.75)):
+        """(groups, count, mean, {q: quantile}) with one entry per group, all as arrays.
+
+        Groups made only of weight-1 centroids (raw points) get the same linear
+        interpolation as numpy.quantile; the others interpolate between centroid centres.
+        """
+        self._flush()
+        if not len(self.group):
+            return self.group, self.weight, self.mean, {q: self.mean for q in qs}
+        g, m, w = _sorted(self.group, self.mean, self.weight)
+        starts, sizes = _runs(g)
+        count = np.add.reduceat(w, starts)
+        mean = np.add.reduceat(w * m, starts) / count
+        cum = np.cumsum(w)
+        before = np.repeat(cum[starts] - w[starts], sizes)
+        centre = (cum - before - w / 2) / np.repeat(count, sizes)
+        # every group occupies (i, i + 1) on one monotone axis, so a single np.interp serves all groups
+        gid = np.repeat(np.arange(len(starts)), sizes)
+        axis = gid + centre
+        first, last = centre[starts], centre[starts + sizes - 1]
+        base = np.arange(len(starts))
+        quant = {q: np.interp(base + np.clip(q, first, last), axis, m) for q in qs}
+        raw = np.add.reduceat((w == 1).astype(np.int64), starts) == sizes
+        if raw.any():
+            for q in qs:
+                pos = q * (sizes - 1)
+                lo = np.floor(pos).astype(np.int64)
+                hi = np.minimum(lo + 1, sizes - 1)
+                exact = m[starts + lo] + (pos - lo) * (m[starts + hi] - m[starts + lo])
+                quant[q] = np.where(raw, exact, quant[q])
+        return g[starts], count, mean, quant
+
+def _sorted(group, mean, weight):
+    """Arrays ordered by (group, mean); two argsorts beat np.lexsort on large inputs."""
+    order = np.argsort(mean)
+    order = order[np.argsort(group[order], kind="stable")]
+    return group[order], mean[order], weight[order]
+
+def _runs(sorted_keys):
+    """Start index and length of each run of equal keys."""
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    return starts, np.diff(np.r_[starts, len(sorted_keys)])
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Columnar Parquet store for daily time series.
+
+Layout: <root>/series=<ID>/year=<YYYY>/data.parquet, each file holding typed
+(date: timestamp[ms], value: float64) columns sorted by date. Reads only open
+the year partitions that overlap the requested window, push the date filter
+down to Parquet row-group statistics and memory-map the files.
+"""
+import os
+import tempfile
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+SCHEMA = pa.schema([("date", pa.timestamp("ms")), ("value", pa.float64())])
+_FS = fs.LocalFileSystem(use_mmap=True)
+_series_locks = {}
+_locks_guard = threading.Lock()
+
+def _series_dir(root, series_id):
+    return os.path.join(root, f"series={series_id}")
+
+def _part_path(root, series_id, year):
+    return os.path.join(_series_dir(root, series_id), f"year={int(year)}", "data.parquet")
+
+def _years(root, series_id):
+    d = _series_dir(root, series_id)
+    if not os.path.isdir(d):
+        return []
+    return sorted(int(p.split("=", 1)[1]) for p in os.listdir(d)
+                  if p.startswith("year=") and os.path.exists(os.path.join(d, p, "data.parquet")))
+
+def _to_table(df):
+    df = pd.DataFrame({"date": pd.to_datetime(df["date"]).astype("datetime64[ms]"),
+                       "value": pd.to_numeric(df["value"], errors="coerce").astype("float64")})
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+def _write_atomic(table, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix="data.parquet.tmp-")   # unique per thread too
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp, row_group_size=4096)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def _series_lock(root, series_id):
+    """In-process lock per series, so concurrent upserts (updater jobs, background top-ups) don't lose rows."""
+    key = os.path.abspath(_series_dir(root, series_id))
+    with _locks_guard:
+        return _series_locks.setdefault(key, threading.Lock())
+
+def list_series(root):
+    """All series ids present in the store."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(p.split("=", 1)[1] for p in os.listdir(root) if p.startswith("series="))
+
+def last_date(root, series_id):
+    """Latest stored date for a series (reads one column of one partition), or None."""
+    years = _years(root, series_id)
+    if not years:
+        return None
+    col = pq.read_table(_part_path(root, series_id, years[-1]), columns=["date"], memory_map=True)["date"]
+    return pd.Timestamp(pc.max(col).as_py()) if len(col) else None
+
+def write_series(root, series_id, df):
+    """Upsert (date, value) rows for a series; only the touched year partitions are rewritten.
+
+    Rows already stored for the same date are replaced by the new values.
+    Returns the number of rows that were added or changed.
+    """
+    if df is None or df.empty:
+        return 0
+    new = _to_table(df).to_pandas()
+    new = new.dropna(subset=["date"]).drop_duplicates("date", keep="last")
+    with _series_lock(root, series_id):
+        return _upsert(root, series_id, new)
+
+def _upsert(root, series_id, new):
+    changed = 0
+    for year, part in new.groupby(new["date"].dt.year):
+        path = _part_path(root, series_id, year)
+        if os.path.exists(path):
+            old = pq.read_table(path, memory_map=True).to_pandas()
+            cmp = part.merge(old, on="date", how="left", suffixes=("", "_old"), indicator=True)
+            same = (cmp["_merge"] == "both") & ((cmp["value"] == cmp["value_old"]) |
+                                               (cmp["value"].isna() & cmp["value_old"].isna()))
+            n = int((~same).sum())
+            if not n:
+                continue
+            part = pd.concat([old, part]).drop_duplicates("date", keep="last")
+        else:
+            n = len(part)
+        _write_atomic(_to_table(part.sort_values("date")), path)
+        changed += n
+    return changed
+
+def read_series(root, series_id, start=None, end=None, columns=("date", "value")):
+    """Read one series between `start` and `end` (inclusive) as a DataFrame."""
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    years = [y for y in _years(root, series_id)
+             if (start is None or y >= start.year) and (end is None or y <= end.year)]
+    if not years:
+        return pd.DataFrame({c: pd.Series(dtype=SCHEMA.field(c).type.to_pandas_dtype()) for c in columns})
+    dataset = ds.dataset([_part_path(root, series_id, y) for y in years],
+                         schema=SCHEMA, format="parquet", filesystem=_FS)
+    cond = None
+    if start is not None:
+        cond = ds.field("date") >= pa.scalar(start, type=pa.timestamp("ms"))
+    if end is not None:
+        upper = ds.field("date") <= pa.scalar(end, type=pa.timestamp("ms"))
+        cond = upper if cond is None else cond & upper
+    return dataset.to_table(columns=list(columns), filter=cond).to_pandas()
+
+def import_csv(root, file, value_col="value"):
+    """One-off migration of a long-format (date, value, series) CSV into the store."""
+    df = pd.read_csv(file, parse_dates=["date"])
+    total = 0
+    for series_id, part in df.groupby("series"):
+        total += write_series(root, series_id, part.rename(columns={value_col: "value"}))
+    return total
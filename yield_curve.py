@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Vectorized UST yield-curve analytics.
+
+The ten FRED constant-maturity series are aligned once into a date × tenor
+NumPy matrix. Pairwise spreads, interpolation at arbitrary maturities,
+level/slope/curvature and historical percentiles are then plain array
+operations over that matrix, with no per-pair merges.
+"""
+import warnings
+from functools import cached_property
+import numpy as np
+import pandas as pd
+import ts_store
+
+# FRED series id → maturity in years (ordered short → long)
+TENORS = {"DGS1MO": 1/12, "DGS3MO": 0.25, "DGS6MO": 0.5, "DGS1": 1, "DGS2": 2,
+          "DGS5": 5, "DGS7": 7, "DGS10": 10, "DGS20": 20, "DGS30": 30}
+LABELS = {"DGS1MO": "1M", "DGS3MO": "3M", "DGS6MO": "6M", "DGS1": "1Y", "DGS2": "2Y",
+          "DGS5": "5Y", "DGS7": "7Y", "DGS10": "10Y", "DGS20": "20Y", "DGS30": "30Y"}
+
+class YieldCurve:
+    def __init__(self, dates, yields, series_ids=tuple(TENORS)):
+        self.series_ids = list(series_ids)
+        self.labels = [LABELS.get(s, s) for s in self.series_ids]
+        self.maturities = np.array([TENORS[s] for s in self.series_ids], dtype=float)
+        self.dates = pd.DatetimeIndex(dates)
+        # Holidays come through as NaN on every tenor; carry the last print forward.
+        self.raw = np.asarray(yields, dtype=float)
+        self.Y = pd.DataFrame(self.raw).ffill().to_numpy()
+        self._col = {s: i for i, s in enumerate(self.series_ids)}
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Build from {series_id: (date, value) frame}."""
+        ids = [s for s in TENORS if s in frames and not frames[s].empty]
+        long = pd.concat([frames[s].assign(series=s) for s in ids], ignore_index=True)
+        wide = long.pivot_table(index="date", columns="series", values="value", aggfunc="last",
+                                dropna=False).reindex(columns=ids)
+        wide = wide.dropna(how="all")
+        return cls(wide.index, wide.to_numpy(), ids)
+
+    @classmethod
+    def from_store(cls, root, start=None, end=None):
+        return cls.from_frames({s: ts_store.read_series(root, s, start, end) for s in TENORS})
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _idx(self, date=None):
+        if date is None:
+            return len(self.dates) - 1
+        return max(0, int(self.dates.searchsorted(pd.Timestamp(date), side="right")) - 1)
+
+    # ----- spreads -----
+    @cached_property
+    def pairs(self):
+        """(long, short) column index pairs for every spread, long maturity first."""
+        i, j = np.triu_indices(len(self.series_ids), k=1)
+        return j, i
+
+    @cached_property
+    def spreads(self):
+        """Date × pair matrix of every long−short spread (percentage points)."""
+        long, short = self.pairs
+        return self.Y[:, long] - self.Y[:, short]
+
+    @cached_property
+    def spread_labels(self):
+        long, short = self.pairs
+        return [f"{self.labels[a]}−{self.labels[b]}" for a, b in zip(long, short)]
+
+    def spread_series(self, long_id, short_id):
+        """One spread as a Date/Spread frame (a single column difference)."""
+        s = self.Y[:, self._col[long_id]] - self.Y[:, self._col[short_id]]
+        return pd.DataFrame({"Date": self.dates, "Spread": s})
+
+    def tenor_frame(self, *series_ids):
+        """Date plus one column per requested tenor (by label)."""
+        cols = {LABELS.get(sid, sid): self.Y[:, self._col[sid]] for sid in series_ids}
+        return pd.DataFrame({"Date": self.dates, **cols})
+
+    def spread_frame(self):
+        return pd.DataFrame(self.spreads, index=self.dates, columns=self.spread_labels)
+
+    # ----- curve -----
+    def snapshot(self, date=None):
+        """Curve on (or before) `date` as a Series indexed by tenor label."""
+        return pd.Series(self.Y[self._idx(date)], index=self.labels, name=self.dates[self._idx(date)])
+
+    def interpolate(self, maturities, rows=None):
+        """Linearly interpolate yields at arbitrary maturities (years) for all (or `rows`) dates.
+
+        Returns a len(rows) × len(maturities) array; flat extrapolation outside 1M–30Y.
+        """
+        m = np.clip(np.atleast_1d(np.asarray(maturities, dtype=float)), self.maturities[0], self.maturities[-1])
+        Y = self.Y if rows is None else self.Y[rows]
+        hi = np.clip(np.searchsorted(self.maturities, m, side="left"), 1, len(self.maturities) - 1)
+        lo = hi - 1
+        w = (m - self.maturities[lo]) / (self.maturities[hi] - self.maturities[lo])
+        return Y[:, lo] * (1 - w) + Y[:, hi] * w
+
+    def _tenor(self, series_id):
+        """One tenor's column, or all-NaN if the tenor isn't loaded (partial store, failed top-up)."""
+        i = self._col.get(series_id)
+        return self.Y[:, i] if i is not None else np.full(len(self.dates), np.nan)
+
+    def shape(self):
+        """Level (mean of tenors), slope (10Y−3M) and curvature (2·5Y − 2Y − 10Y) per date.
+
+        Slope or curvature is NaN when a tenor it needs is missing.
+        """
+        t = self._tenor
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN rows → NaN level
+            level = np.nanmean(self.Y, axis=1)
+        slope = t("DGS10") - t("DGS3MO")
+        curvature = 2 * t("DGS5") - t("DGS2") - t("DGS10")
+        return pd.DataFrame({"Level": level, "Slope": slope, "Curvature": curvature}, index=self.dates)
+
+    @staticmethod
+    def percentile_rank(matrix, row=-1):
+        """Percentile (0–100) of `matrix[row]` within each column's history, NaN-aware.
+
+        NaN where the current value itself is NaN.
+        """
+        X = np.asarray(matrix, dtype=float)
+        x = X[row]
+        valid = ~np.isnan(X)
+        below = ((X <= x) & valid).sum(axis=0)
+        return np.where(np.isnan(x), np.nan, 100.0 * below / np.maximum(valid.sum(axis=0), 1))
+
+    def percentiles(self, date=None):
+        """Percentile of each tenor, spread and shape metric on `date` vs. the loaded history."""
+        i = self._idx(date)
+        shape = self.shape().to_numpy()
+        return pd.concat([
+            pd.Series(self.percentile_rank(self.Y[:i + 1]), index=self.labels),
+            pd.Series(self.percentile_rank(self.spreads[:i + 1]), index=self.spread_labels),
+            pd.Series(self.percentile_rank(shape[:i + 1]), index=["Level", "Slope", "Curvature"]),
+        ])